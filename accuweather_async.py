@@ -0,0 +1,120 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Iterable, Tuple, AsyncIterator, Optional
+
+import accuweather_client as accu
+from accuweather_client import AccuError
+
+# Async wrappers over accuweather_client. The blocking calls run on worker
+# threads so they keep sharing the pooled session, retries and error handling.
+
+DEFAULT_CONCURRENCY = 8
+
+
+async def search_by_text(query: str) -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(accu.search_by_text, query)
+
+async def search_by_postal(query: str) -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(accu.search_by_postal, query)
+
+async def search_by_geo(lat: float, lon: float) -> Dict[str, Any]:
+    return await asyncio.to_thread(accu.search_by_geo, lat, lon)
+
+async def current_conditions(location_key: str) -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(accu.current_conditions, location_key)
+
+async def forecast_5day(location_key: str, metric: bool=True, fresh: bool=False) -> Dict[str, Any]:
+    return await asyncio.to_thread(accu.forecast_5day, location_key, metric, fresh)
+
+
+async def fetch_location(location_key: str, metric: bool=True) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    # Current conditions and 5-day forecast in parallel; raises AccuError if either fails
+    current, forecast = await asyncio.gather(
+        current_conditions(location_key),
+        forecast_5day(location_key, metric),
+    )
+    return current, forecast
+
+
+async def _fan_out(keys: List[str], fetch, concurrency: int, return_exceptions: bool) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(key: str):
+        async with sem:
+            try:
+                return await fetch(key)
+            except AccuError as e:
+                if return_exceptions:
+                    return e
+                raise
+
+    results = await asyncio.gather(*(one(k) for k in keys))
+    return dict(zip(keys, results))
+
+
+async def fetch_many(location_keys: Iterable[str], metric: bool=True,
+                     concurrency: int=DEFAULT_CONCURRENCY,
+                     return_exceptions: bool=False) -> Dict[str, Any]:
+    """Fetch (current, forecast) for many keys with at most `concurrency` in flight.
+
+    Like asyncio.gather, the first AccuError is raised unless return_exceptions
+    is set, in which case failed keys map to their AccuError instead.
+    """
+    keys = list(dict.fromkeys(location_keys))
+    return await _fan_out(keys, lambda k: fetch_location(k, metric), concurrency, return_exceptions)
+
+
+async def fetch_forecasts(location_keys: Iterable[str], metric: bool=True,
+                          concurrency: int=DEFAULT_CONCURRENCY,
+                          return_exceptions: bool=False, fresh: bool=False) -> Dict[str, Any]:
+    # Same as fetch_many but forecast_5day only; fresh=True bypasses the response cache
+    keys = list(dict.fromkeys(location_keys))
+    return await _fan_out(keys, lambda k: forecast_5day(k, metric, fresh), concurrency, return_exceptions)
+
+
+async def iter_many(location_keys: Iterable[str], metric: bool=True,
+                    concurrency: int=DEFAULT_CONCURRENCY) -> AsyncIterator[Tuple[str, Any]]:
+    """Yield (key, (current, forecast)) as each location completes, fastest first.
+
+    Failed keys yield their AccuError instead, so one bad site never stops the rest.
+    """
+    keys = list(dict.fromkeys(location_keys))
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(key: str):
+        async with sem:
+            try:
+                return key, await fetch_location(key, metric)
+            except AccuError as e:
+                return key, e
+
+    for done in asyncio.as_completed([one(k) for k in keys]):
+        yield await done
+
+
+def run(coro, workers: Optional[int]=None):
+    # Convenience for sync callers such as the Streamlit script. `workers` sizes
+    # the to_thread pool; the default (cpu count + 4) caps fan-out on small hosts.
+    if workers is None:
+        return asyncio.run(coro)
+
+    async def main():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(workers, thread_name_prefix="accu"))
+        return await coro
+    return asyncio.run(main())
+
+
+def get_location(location_key: str, metric: bool=True) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    return run(fetch_location(location_key, metric))
+
+
+def get_many(location_keys: Iterable[str], metric: bool=True,
+             concurrency: int=DEFAULT_CONCURRENCY,
+             return_exceptions: bool=False) -> Dict[str, Any]:
+    return run(fetch_many(location_keys, metric, concurrency, return_exceptions))
+
+
+def get_forecasts(location_keys: Iterable[str], metric: bool=True,
+                  concurrency: int=DEFAULT_CONCURRENCY,
+                  return_exceptions: bool=False, fresh: bool=False) -> Dict[str, Any]:
+    return run(fetch_forecasts(location_keys, metric, concurrency, return_exceptions, fresh))
@@ -1,53 +1,149 @@
 import os
+import threading
 import requests
+import http_session
+import cache
+import ratelimit
+import metrics
+from singleflight import SingleFlight
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 
 load_dotenv()
 
-ACCU_API = "https://dataservice.accuweather.com"
+# Overridable so tests/benchmarks can point at a local stand-in server
+ACCU_API = os.getenv("ACCUWEATHER_BASE_URL", "https://dataservice.accuweather.com").rstrip("/")
+IPINFO_URL = os.getenv("IPINFO_URL", "https://ipinfo.io/json")
 API_KEY = os.getenv("ACCUWEATHER_API_KEY", "")
 
 class AccuError(Exception):
     pass
 
+class QuotaError(AccuError):
+    # Raised client-side when the rate limiter or daily budget refuses a call
+    pass
+
 def _check_key():
     if not API_KEY:
         raise AccuError("Missing ACCUWEATHER_API_KEY. Set it in your .env")
 
-def _get(url: str, params: Dict[str, Any]) -> Any:
+def _acquire():
+    # One token and one ledger entry per upstream attempt, retries included
+    try:
+        ratelimit.acquire(API_KEY)
+    except ratelimit.RateLimited as e:
+        raise QuotaError(str(e))
+
+def _get(url: str, params: Dict[str, Any], endpoint: str = "default") -> Any:
     _check_key()
     params = {**params, "apikey": API_KEY}
-    r = requests.get(url, params=params, timeout=15)
-    if r.status_code != 200:
-        raise AccuError(f"AccuWeather API error: {r.status_code} {r.text[:200]}")
-    return r.json()
+    with metrics.timed("accuweather_request", endpoint=endpoint):
+        try:
+            r = http_session.get(url, params=params, endpoint=endpoint, before_attempt=_acquire)
+        except requests.RequestException as e:
+            raise AccuError(f"AccuWeather request failed: {e}")
+        if r.status_code != 200:
+            raise AccuError(f"AccuWeather API error: {r.status_code} {r.text[:200]}")
+    with metrics.timed("json", op="loads_response"):
+        return r.json()
+
+# Identical (endpoint, params) requests in flight at the same time share one upstream call
+_flight = SingleFlight()
+
+def coalescing_stats() -> Dict[str, int]:
+    return _flight.stats()
+
+def budget_stats() -> Dict[str, Any]:
+    # Tokens, daily used/remaining, degrade flag and time spent waiting on the limiter
+    return ratelimit.stats(API_KEY)
+
+def _fetch_and_store(endpoint: str, key: str, url: str, params: Dict[str, Any]) -> Any:
+    value = _get(url, params, endpoint)
+    cache.get_cache().set(endpoint, key, value)
+    return value
+
+def _flight_key(key: str, prio: Optional[str] = None) -> str:
+    # Flights are per priority: an interactive miss must not wait on a background
+    # leader (up to MAX_WAIT["background"]) or inherit its QuotaError from the reserve
+    return f"{prio or ratelimit.current_priority()}|{key}"
+
+def _fetch_shared(endpoint: str, key: str, url: str, params: Dict[str, Any]) -> Any:
+    return _flight.do(_flight_key(key), lambda: _fetch_and_store(endpoint, key, url, params))
+
+def _revalidate(endpoint: str, key: str, url: str, params: Dict[str, Any]):
+    try:
+        with ratelimit.priority(ratelimit.BACKGROUND):
+            _fetch_shared(endpoint, key, url, params)
+    except AccuError:
+        pass  # keep serving the stale copy until it expires
+
+def _cached_get(url: str, params: Dict[str, Any], endpoint: str, fresh: bool=False) -> Any:
+    # Fresh hit -> return; stale hit -> return and refresh in the background; miss -> fetch
+    # Near the end of the daily budget, any cached copy (even expired) beats an upstream call
+    # fresh=True skips the read: always fetch upstream and write the response back
+    key = cache.make_key(endpoint, url, params)
+    if fresh:
+        return _fetch_shared(endpoint, key, url, params)
+    degraded = bool(API_KEY) and ratelimit.degraded(API_KEY)
+    value, state = cache.get_cache().get(key, allow_expired=degraded)
+    if state == cache.FRESH:
+        return value
+    if state == cache.STALE:
+        if degraded:
+            ratelimit.note_degraded_serve()
+        elif not _flight.in_flight(_flight_key(key, ratelimit.BACKGROUND)):
+            threading.Thread(target=_revalidate, args=(endpoint, key, url, params), daemon=True).start()
+        return value
+    return _fetch_shared(endpoint, key, url, params)
 
 def search_by_text(query: str) -> List[Dict[str, Any]]:
     # Cities/landmarks text search
     url = f"{ACCU_API}/locations/v1/cities/search"
-    return _get(url, {"q": query, "details": "true"})
+    return _cached_get(url, {"q": query, "details": "true"}, endpoint="search")
 
 def search_by_postal(query: str) -> List[Dict[str, Any]]:
     url = f"{ACCU_API}/locations/v1/postalcodes/search"
-    return _get(url, {"q": query, "details": "true"})
+    return _cached_get(url, {"q": query, "details": "true"}, endpoint="search")
 
 def search_by_geo(lat: float, lon: float) -> Dict[str, Any]:
     url = f"{ACCU_API}/locations/v1/cities/geoposition/search"
-    return _get(url, {"q": f"{lat},{lon}", "details": "true"})
+    return _cached_get(url, {"q": f"{lat},{lon}", "details": "true"}, endpoint="search")
 
 def current_conditions(location_key: str) -> List[Dict[str, Any]]:
     url = f"{ACCU_API}/currentconditions/v1/{location_key}"
-    return _get(url, {"details": "true"})
+    return _cached_get(url, {"details": "true"}, endpoint="current")
 
-def forecast_5day(location_key: str, metric: bool=True) -> Dict[str, Any]:
+def forecast_5day(location_key: str, metric: bool=True, fresh: bool=False) -> Dict[str, Any]:
     url = f"{ACCU_API}/forecasts/v1/daily/5day/{location_key}"
-    return _get(url, {"metric": str(metric).lower()})
+    return _cached_get(url, {"metric": str(metric).lower()}, endpoint="forecast", fresh=fresh)
+
+# Pre-warming: refresh a location's cached current/forecast before they expire
+def _endpoint_requests(location_key: str, metric: bool=True):
+    return [
+        ("current", f"{ACCU_API}/currentconditions/v1/{location_key}", {"details": "true"}),
+        ("forecast", f"{ACCU_API}/forecasts/v1/daily/5day/{location_key}", {"metric": str(metric).lower()}),
+    ]
+
+def warm_location(location_key: str, lead: Dict[str, float], metric: bool=True) -> int:
+    """Refetch each endpoint whose cache entry is missing or expires within lead[endpoint] seconds.
+
+    Returns the number of upstream refreshes made.
+    """
+    c = cache.get_cache()
+    refreshed = 0
+    for endpoint, url, params in _endpoint_requests(location_key, metric):
+        key = cache.make_key(endpoint, url, params)
+        left = c.expires_in(key)
+        if left is not None and left > lead.get(endpoint, 0):
+            continue
+        _fetch_shared(endpoint, key, url, params)
+        refreshed += 1
+    return refreshed
 
 def ip_lookup_coords() -> Optional[Dict[str, float]]:
 
     try:
-        r = requests.get("https://ipinfo.io/json", timeout=10)
+        r = http_session.get(IPINFO_URL, endpoint="ipinfo")
         if r.status_code == 200:
             data = r.json()
             if "loc" in data:
@@ -0,0 +1,151 @@
+from typing import Dict, Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+
+from db import get_conn
+
+# Aggregates across all saved forecasts. The loaders stream their table in
+# chunks of CHUNK_ROWS rows (pd.read_sql_query(chunksize=)); each summary
+# reduces a chunk to partial aggregates with pandas/NumPy group-bys and then
+# merges the partials, so memory follows the size of the result rather than
+# the table and there are no per-day Python loops. The summaries also accept
+# a single DataFrame.
+
+CHUNK_ROWS = 50_000
+
+Frames = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+
+def _frames(data: Frames) -> Iterable[pd.DataFrame]:
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+
+def iter_days(units: str = "metric", chunksize: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Latest forecast per location/day in chunks: location_key, date, min_temp, max_temp, precip."""
+    chunks = pd.read_sql_query("""
+        SELECT location_key, date, min_temp, max_temp,
+               COALESCE(day_has_precip, 0) OR COALESCE(night_has_precip, 0) AS precip
+        FROM daily_forecasts WHERE units = ?
+    """, get_conn(), params=(units,), chunksize=chunksize)
+    for df in chunks:
+        df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+        df["min_temp"] = df["min_temp"].astype("float64")
+        df["max_temp"] = df["max_temp"].astype("float64")
+        df["precip"] = df["precip"].astype(bool)
+        df["location_key"] = df["location_key"].astype(str)
+        yield df
+
+
+def iter_revisions(units: str = "metric", chunksize: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    # Ordered by (location, date, recorded_at); forecast_drift relies on it across chunk boundaries
+    chunks = pd.read_sql_query("""
+        SELECT location_key, date, recorded_at, min_temp, max_temp
+        FROM forecast_revisions WHERE units = ?
+        ORDER BY location_key, date, recorded_at
+    """, get_conn(), params=(units,), chunksize=chunksize)
+    for df in chunks:
+        df["min_temp"] = df["min_temp"].astype("float64")
+        df["max_temp"] = df["max_temp"].astype("float64")
+        yield df
+
+
+def location_labels() -> Dict[str, str]:
+    # Label from the most recent saved request for each key
+    rows = get_conn().execute("""
+        SELECT location_key, location_label FROM weather_requests
+        WHERE id IN (SELECT MAX(id) FROM weather_requests GROUP BY location_key)
+    """).fetchall()
+    return dict(rows)
+
+
+def weekly_summary(days: Frames) -> pd.DataFrame:
+    """Min/max/mean temperature and precipitation days per location per ISO week (Monday start)."""
+    parts = []
+    for df in _frames(days):
+        if df.empty:
+            continue
+        week = df["date"] - pd.to_timedelta(df["date"].dt.dayofweek, unit="D")
+        mid = (df["min_temp"].to_numpy() + df["max_temp"].to_numpy()) / 2
+        frame = pd.DataFrame({
+            "location_key": df["location_key"].astype(str), "week": week,
+            "min_temp": df["min_temp"], "max_temp": df["max_temp"],
+            "mid": mid, "precip": df["precip"],
+        })
+        parts.append(frame.groupby(["location_key", "week"], sort=False).agg(
+            min_temp=("min_temp", "min"),
+            max_temp=("max_temp", "max"),
+            mid_sum=("mid", "sum"),
+            mid_n=("mid", "count"),
+            precip_days=("precip", "sum"),
+            days=("precip", "size"),
+        ))
+    if not parts:
+        return pd.DataFrame(columns=["location_key", "week", "min_temp", "max_temp", "mean_temp", "precip_days", "days"])
+    out = pd.concat(parts).groupby(level=["location_key", "week"], sort=True).agg(
+        {"min_temp": "min", "max_temp": "max", "mid_sum": "sum", "mid_n": "sum", "precip_days": "sum", "days": "sum"}
+    )
+    out.insert(2, "mean_temp", (out["mid_sum"] / out["mid_n"].replace(0, np.nan)).round(1))
+    return out.drop(columns=["mid_sum", "mid_n"]).reset_index()
+
+
+def precipitation_days(days: Frames) -> pd.DataFrame:
+    """Days with any day/night precipitation vs. total forecast days, per location."""
+    parts = [
+        df.groupby(df["location_key"].astype(str), sort=False).agg(precip_days=("precip", "sum"), days=("precip", "size"))
+        for df in _frames(days) if not df.empty
+    ]
+    if not parts:
+        return pd.DataFrame(columns=["location_key", "precip_days", "days", "share"])
+    out = pd.concat(parts).groupby(level=0).sum().reset_index()
+    out["share"] = (out["precip_days"] / out["days"]).round(2)
+    return out.sort_values("precip_days", ascending=False, ignore_index=True)
+
+
+def forecast_drift(revisions: Frames) -> pd.DataFrame:
+    """How much successive saves of the same location/day moved the forecast.
+
+    For every pair of consecutive revisions of a day, the change in min/max
+    temperature is taken; results are summarised per location. Chunks must
+    come in (location, date, recorded_at) order, as iter_revisions yields them.
+    """
+    cols = ["location_key", "revisions", "mean_abs_min_change", "mean_abs_max_change", "max_abs_change"]
+    parts = []
+    carry = None
+    for df in _frames(revisions):
+        if df.empty:
+            continue
+        # The previous chunk's last row, so a series split across chunks keeps its first change
+        if carry is not None:
+            df = pd.concat([carry, df], ignore_index=True)
+        carry = df.iloc[[-1]]
+        key = df["location_key"].astype(str).to_numpy()
+        day = df["date"].to_numpy()
+        # Rows are sorted by (location, date, recorded_at): a row continues the
+        # previous one's series when both key and date match
+        same = np.zeros(len(df), dtype=bool)
+        same[1:] = (key[1:] == key[:-1]) & (day[1:] == day[:-1])
+        if not same.any():
+            continue
+        d_min = np.abs(np.diff(df["min_temp"].to_numpy(), prepend=np.nan))
+        d_max = np.abs(np.diff(df["max_temp"].to_numpy(), prepend=np.nan))
+        changes = pd.DataFrame({"location_key": key[same], "d_min": d_min[same], "d_max": d_max[same]})
+        changes["d_any"] = np.fmax(changes["d_min"], changes["d_max"])
+        parts.append(changes.groupby("location_key", sort=False).agg(
+            revisions=("d_min", "size"),
+            min_sum=("d_min", "sum"), min_n=("d_min", "count"),
+            max_sum=("d_max", "sum"), max_n=("d_max", "count"),
+            max_abs_change=("d_any", "max"),
+        ))
+    if not parts:
+        return pd.DataFrame(columns=cols)
+    agg = pd.concat(parts).groupby(level=0).agg(
+        {"revisions": "sum", "min_sum": "sum", "min_n": "sum", "max_sum": "sum", "max_n": "sum", "max_abs_change": "max"}
+    )
+    out = pd.DataFrame({
+        "revisions": agg["revisions"],
+        "mean_abs_min_change": agg["min_sum"] / agg["min_n"].replace(0, np.nan),
+        "mean_abs_max_change": agg["max_sum"] / agg["max_n"].replace(0, np.nan),
+        "max_abs_change": agg["max_abs_change"],
+    }).rename_axis("location_key").reset_index()
+    return out.round(2).sort_values("max_abs_change", ascending=False, ignore_index=True)
@@ -0,0 +1,411 @@
+import argparse
+import asyncio
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+import accuweather_async as accu
+import cache
+import db_ops
+import geoindex
+import metrics
+from accuweather_client import AccuError, QuotaError
+from db import init_db
+from export import FORMATS as EXPORT_FORMATS, export
+
+# Headless JSON API over the same client, cache and database as the
+# Streamlit app. Blocking work (client calls, SQLite) runs on worker threads
+# so the event loop only shuffles bytes; client calls share the pooled HTTP
+# session, the response cache and single-flight coalescing.
+#
+#   python api.py --port 8080
+#
+# GET responses carry an ETag; pollers sending If-None-Match get a 304.
+
+DEFAULT_PORT = int(os.getenv("API_PORT", "8080"))
+MAX_PAGE = 200
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _json(request: web.Request, payload: Any, status: int = 200, max_age: Optional[int] = None) -> web.Response:
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    headers = {}
+    if request.method == "GET" and status == 200:
+        tag = _etag(body)
+        headers["ETag"] = tag
+        if max_age is not None:
+            headers["Cache-Control"] = f"max-age={max_age}"
+        match = request.headers.get("If-None-Match", "")
+        if tag in [t.strip() for t in match.split(",")] or match.strip() == "*":
+            return web.Response(status=304, headers=headers)
+    return web.Response(body=body, status=status, content_type="application/json", headers=headers)
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+def _int(value: Optional[str], name: str) -> Optional[int]:
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": f"{name} must be an integer"}), content_type="application/json")
+
+
+def _date(value: Optional[str], name: str) -> Optional[str]:
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": f"{name} must be YYYY-MM-DD"}), content_type="application/json")
+
+
+def _epoch(day: str) -> int:
+    # UTC midnight of a YYYY-MM-DD date
+    return int(datetime.fromisoformat(day).replace(tzinfo=timezone.utc).timestamp())
+
+
+def _filters(q) -> Dict[str, Any]:
+    return {
+        "label": q.get("label") or None,
+        "location_key": q.get("key") or None,
+        "date_from": _date(q.get("from"), "from"),
+        "date_to": _date(q.get("to"), "to"),
+    }
+
+
+@web.middleware
+async def accu_errors(request: web.Request, handler):
+    try:
+        return await handler(request)
+    except QuotaError as e:
+        return _error(429, str(e))
+    except AccuError as e:
+        return _error(502, str(e))
+
+
+@web.middleware
+async def timing(request: web.Request, handler):
+    # Labelled by route pattern, not raw path, to keep the series count bounded
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else "unmatched"
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        resp = await handler(request)
+        status = resp.status
+        return resp
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.observe("api_request", time.perf_counter() - t0, status >= 500, route=route)
+
+
+# --- weather ---------------------------------------------------------------
+
+async def search(request: web.Request) -> web.Response:
+    q = request.query.get("q", "").strip()
+    if not q:
+        return _error(400, "q is required")
+    results = await asyncio.to_thread(geoindex.resolve, q)
+    return _json(request, results, max_age=cache.ttl_for("search")[0])
+
+
+async def current(request: web.Request) -> web.Response:
+    data = await accu.current_conditions(request.match_info["key"])
+    return _json(request, data, max_age=cache.ttl_for("current")[0])
+
+
+async def forecast(request: web.Request) -> web.Response:
+    metric = request.query.get("metric", "true").lower() != "false"
+    data = await accu.forecast_5day(request.match_info["key"], metric)
+    return _json(request, data, max_age=cache.ttl_for("forecast")[0])
+
+
+async def location(request: web.Request) -> web.Response:
+    # Current conditions and forecast fetched concurrently
+    metric = request.query.get("metric", "true").lower() != "false"
+    cur, fc = await accu.fetch_location(request.match_info["key"], metric)
+    return _json(request, {"current": cur, "forecast": fc}, max_age=cache.ttl_for("current")[0])
+
+
+async def history(request: web.Request) -> web.Response:
+    # Archived observations; resolution defaults to the coarsest level suiting the span
+    import archive
+
+    q = request.query
+    now = int(time.time())
+    start = _date(q.get("from"), "from")
+    end = _date(q.get("to"), "to")
+    start_ts = _epoch(start) if start else now - 30 * 86400
+    end_ts = _epoch(end) + 86400 if end else now
+    resolution = q.get("resolution") or None
+    if resolution not in (None, "raw", "hourly", "daily"):
+        return _error(400, "resolution must be raw, hourly or daily")
+    data = await asyncio.to_thread(archive.series, request.match_info["key"], start_ts, end_ts, resolution)
+    return _json(request, data, max_age=60)
+
+
+# --- saved requests --------------------------------------------------------
+
+def _request_dict(row) -> Dict[str, Any]:
+    return {"id": row[0], "location_key": row[1], "location_label": row[2],
+            "start_date": row[3], "end_date": row[4], "units": row[5], "forecast": row[6]}
+
+
+async def list_saved(request: web.Request) -> web.Response:
+    q = request.query
+    limit = max(1, min(MAX_PAGE, _int(q.get("limit"), "limit") or 25))
+    filters = _filters(q)
+    rows, next_before = await asyncio.to_thread(
+        db_ops.list_requests_page, limit, _int(q.get("before"), "before"), **filters
+    )
+    total = await asyncio.to_thread(db_ops.count_requests, **filters)
+    items = [{"id": r[0], "location_label": r[1], "start_date": r[2], "end_date": r[3], "units": r[4]} for r in rows]
+    return _json(request, {"items": items, "next_before": next_before, "total": total})
+
+
+async def get_saved(request: web.Request) -> web.Response:
+    row = await asyncio.to_thread(db_ops.get_requests, _int(request.match_info["id"], "id"))
+    if not row:
+        return _error(404, "request not found")
+    return _json(request, _request_dict(row))
+
+
+async def create_saved(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+        key = str(body["location_key"])
+        start = _date(body["start_date"], "start_date")
+        end = _date(body["end_date"], "end_date")
+    except (ValueError, KeyError, TypeError):
+        return _error(400, "location_key, start_date and end_date are required")
+    if start > end:
+        return _error(400, "start_date must be <= end_date")
+    units = body.get("units") or "metric"
+    data = body.get("forecast")
+    if data is None:
+        data = await accu.forecast_5day(key, units == "metric")
+    rid = await asyncio.to_thread(
+        db_ops.save_request, key, body.get("location_label") or key, start, end, units, data
+    )
+    row = await asyncio.to_thread(db_ops.get_requests, rid)
+    return _json(request, _request_dict(row), status=201)
+
+
+async def update_saved(request: web.Request) -> web.Response:
+    rid = _int(request.match_info["id"], "id")
+    row = await asyncio.to_thread(db_ops.get_requests, rid)
+    if not row:
+        return _error(404, "request not found")
+    try:
+        body = await request.json()
+        start = _date(body["start_date"], "start_date")
+        end = _date(body["end_date"], "end_date")
+    except (ValueError, KeyError, TypeError):
+        return _error(400, "start_date and end_date are required")
+    # Same rules as the Saved Requests tab: only narrow within the original window
+    if start > end or start < row[3] or end > row[4]:
+        return _error(400, f"dates must satisfy {row[3]} <= start_date <= end_date <= {row[4]}")
+    await asyncio.to_thread(db_ops.update_request, rid, start, end)
+    row = await asyncio.to_thread(db_ops.get_requests, rid)
+    return _json(request, _request_dict(row))
+
+
+async def delete_saved(request: web.Request) -> web.Response:
+    if not await asyncio.to_thread(db_ops.delete_request, _int(request.match_info["id"], "id")):
+        return _error(404, "request not found")
+    return web.Response(status=204)
+
+
+async def refresh_saved(request: web.Request) -> web.Response:
+    # One upstream call per distinct location across the selected requests
+    import refresh
+
+    if "id" in request.match_info:
+        selection = {"request_ids": [_int(request.match_info["id"], "id")]}
+    else:
+        try:
+            body = await request.json() if request.can_read_body else {}
+            if not isinstance(body, dict):
+                raise TypeError("body must be an object")
+            ids = body.get("request_ids")
+            if ids is not None and not (isinstance(ids, list) and all(type(i) is int for i in ids)):
+                raise TypeError("request_ids must be a list of integers")
+            selection = {k: body.get(k) for k in ("label", "location_key")}
+            selection["request_ids"] = ids
+            selection["date_from"] = _date(body.get("date_from"), "date_from")
+            selection["date_to"] = _date(body.get("date_to"), "date_to")
+        except (ValueError, TypeError):
+            return _error(400, "body must be a JSON object with optional request_ids (list of integers), "
+                               "label, location_key, date_from and date_to")
+    result = await asyncio.to_thread(refresh.refresh, **selection)
+    if not result["requests"]:
+        return _error(404, "no matching requests")
+    return _json(request, result)
+
+
+class _ExportAborted(Exception):
+    pass
+
+
+class _ChunkPipe(io.RawIOBase):
+    # File object for the sync export writers that hands chunks to the event loop.
+    # abort() (on the loop) releases a writer blocked on a full queue and makes
+    # every later write raise, so the worker thread unwinds instead of leaking.
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+        self.aborted = threading.Event()
+        self._pending: Optional[concurrent.futures.Future] = None
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        if data:
+            self._put(data)
+        return len(data)
+
+    def _put(self, item):
+        if self.aborted.is_set():
+            raise _ExportAborted("client went away")
+        self._pending = asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop)
+        try:
+            self._pending.result()
+        except concurrent.futures.CancelledError:
+            raise _ExportAborted("client went away") from None
+
+    def abort(self):
+        self.aborted.set()
+        if self._pending is not None:
+            self._pending.cancel()
+        # A put submitted after the flag check still finds room
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+async def export_saved(request: web.Request) -> web.StreamResponse:
+    fmt = request.query.get("format", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return _error(400, f"format must be one of {', '.join(sorted(EXPORT_FORMATS))}")
+    query = _filters(request.query)
+    ids = request.query.get("ids")
+    if ids:
+        query["request_ids"] = [_int(i, "ids") for i in ids.split(",")]
+    _, mime, ext = EXPORT_FORMATS[fmt]
+
+    resp = web.StreamResponse(headers={
+        "Content-Type": mime,
+        "Content-Disposition": f'attachment; filename="weather_requests.{ext}"',
+    })
+    await resp.prepare(request)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+    pipe = _ChunkPipe(loop, queue)
+    done = object()
+
+    def run():
+        try:
+            with io.BufferedWriter(pipe, buffer_size=64 * 1024) as fh:
+                export(fmt, fh, **query)
+        except _ExportAborted:
+            pass
+        finally:
+            # Sent from the worker so it waits for room like any chunk
+            try:
+                pipe._put(done)
+            except _ExportAborted:
+                pass
+
+    task = loop.run_in_executor(None, run)
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is done:
+                break
+            await resp.write(chunk)
+    except BaseException:
+        # Disconnect (write error or handler cancellation): stop the worker
+        pipe.abort()
+        raise
+    await task
+    await resp.write_eof()
+    return resp
+
+
+# --- ops -------------------------------------------------------------------
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"ok": True})
+
+
+async def stats(request: web.Request) -> web.Response:
+    from accuweather_client import coalescing_stats, budget_stats
+    import http_session
+
+    payload = await asyncio.to_thread(lambda: {
+        "http": http_session.stats(),
+        "cache": cache.get_cache().stats(),
+        "coalescing": coalescing_stats(),
+        "budget": budget_stats(),
+        "geoindex": geoindex.stats(),
+    })
+    return web.json_response(payload)
+
+
+async def prometheus(request: web.Request) -> web.Response:
+    return web.Response(body=metrics.render_prometheus().encode(),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+def make_app() -> web.Application:
+    init_db()
+    app = web.Application(middlewares=[timing, accu_errors])
+    app.add_routes([
+        web.get("/healthz", health),
+        web.get("/stats", stats),
+        web.get("/metrics", prometheus),
+        web.get("/search", search),
+        web.get("/locations/{key}", location),
+        web.get("/locations/{key}/current", current),
+        web.get("/locations/{key}/forecast", forecast),
+        web.get("/locations/{key}/history", history),
+        web.get("/requests", list_saved),
+        web.post("/requests", create_saved),
+        web.get("/requests/export", export_saved),
+        web.post("/requests/refresh", refresh_saved),
+        web.post("/requests/{id}/refresh", refresh_saved),
+        web.get("/requests/{id}", get_saved),
+        web.patch("/requests/{id}", update_saved),
+        web.delete("/requests/{id}", delete_saved),
+    ])
+    return app
+
+
+def main():
+    p = argparse.ArgumentParser(description="Weather JSON API")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = p.parse_args()
+    web.run_app(make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,53 @@
-from datetime import date, datetime
-from io import BytesIO
+from datetime import date
 import json
-import pandas as pd
 import streamlit as st
-from accuweather_client import (
-        search_by_text, search_by_postal, search_by_geo,
-        current_conditions, forecast_5day, ip_lookup_coords, AccuError
-    )
 from utils import icon_emoji, fmt_dt
-from typing import Optional
-from db_ops import save_request, get_requests, delete_request, list_requests, update_request
+from typing import Iterable, List, Optional
+from db_ops import (
+        save_request, get_requests, get_request_days, delete_request, update_request, log_access,
+        list_requests_page, count_requests, list_watchlist, add_watch, remove_watch
+    )
 from db import init_db
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from xml.sax.saxutils import escape as xml_escape
-
-init_db()
+import os
+from export import export, FORMATS as EXPORT_FORMATS
+import tempfile
+import time
+import metrics
+from models import Location, Day, parse_locations, parse_current, parse_forecast
+
+# Heavy dependencies load on first use instead of on every cold start:
+# pandas/NumPy (analytics, tables) only when a tab that renders them is open,
+# the HTTP client stack (requests, dotenv, cache, rate limiter) on the first
+# search, reportlab inside the PDF writer.
+
+@st.cache_resource(show_spinner=False)
+def _startup():
+    # One-time process setup; later reruns get the cached result
+    init_db()
+    if os.getenv("ACCU_PREWARM", "").lower() in ("1", "true", "yes"):
+        import prewarm
+        prewarm.start_background()
+    if os.getenv("ACCU_ARCHIVE", "").lower() in ("1", "true", "yes"):
+        import archive
+        archive.start_background()
+    metrics.start_file_exporter()
+    return True
+
+_startup()
     
 st.set_page_config(page_title="Weather • AccuWeather", page_icon="⛅", layout="centered")
 
+# Rerun timing; APP_PROFILE=1 captures a cProfile of each rerun, APP_DIAGNOSTICS=1
+# shows the metrics panel in the sidebar. Operator settings only: no query-param switch
+_rerun_t0 = time.perf_counter()
+_truthy = ("1", "true", "yes")
+_profiling = os.getenv("APP_PROFILE", "").lower() in _truthy
+_diagnostics = os.getenv("APP_DIAGNOSTICS", "").lower() in _truthy
+if st.session_state.get("_profiler") is not None:
+    # Previous rerun ended early (st.stop) before its profile was collected
+    st.session_state._profiler.disable()
+st.session_state._profiler = metrics.start_profile() if _profiling else None
+
 c_head_1, c_head_2 = st.columns([6,1])
 
 with c_head_1:
@@ -58,50 +87,30 @@ LinkedIn page: *Product Manager Accelerator*
 """)
 
 @st.cache_data(show_spinner=False, ttl=600)
-def _search_location(query: str):
-       
-    q = query.strip()
-    if "," in q:
-        try:
-            lat, lon = [float(x.strip()) for x in q.split(",", 1)]
-            loc = search_by_geo(lat, lon)
-            return [loc] if loc else []
-        except Exception:
-            pass
-    if q.replace("-", "").replace(" ", "").isdigit():
-        return search_by_postal(q)
-    return search_by_text(q)
-    
-@st.cache_data(show_spinner=False, ttl=300)
-def _get_current(location_key: str):
-    return current_conditions(location_key)
-    
-@st.cache_data(show_spinner=False, ttl=300)
-def _get_forecast(location_key: str):
-    return forecast_5day(location_key, metric=True)
-
-def _slice_forecast_json(fjson: dict, start_str: str, end_str: str) -> dict:
-    
-    try:
-        start = date.fromisoformat(start_str)
-        end = date.fromisoformat(end_str)
-    except Exception:
-        return fjson
-    dfs = fjson.get("DailyForecasts", []) if isinstance(fjson, dict) else []
-    kept = []
-    for d in dfs:
-        try:
-            dt = datetime.fromisoformat(d["Date"].replace("Z", "+00:00")).date()
-        except Exception:
-            continue
-        if start <= dt <= end:
-            kept.append(d)
-    return {**fjson, "DailyForecasts": kept}
-
-
-
+def _search_location(query: str) -> List[Location]:
+    # Local location index first (nearby coordinates, queries answered before), then AccuWeather
+    import geoindex
+    return parse_locations(geoindex.resolve(query))
     
-def pick_location_ui(default_query: str = "") -> Optional[dict]:
+SHOWN_TTL = 300  # seconds the location on screen is reused across reruns
+
+def _get_current_and_forecast(location_key: str):
+    # Both calls in flight at once, so the page waits for the slower one only.
+    # The page renders compact models; the raw forecast is kept beside them in
+    # session state so "Save request" stores exactly what was shown without a
+    # second fetch. Only the location on screen is held.
+    shown = st.session_state.get("shown_forecast")
+    if shown and shown["key"] == location_key and time.time() - shown["at"] < SHOWN_TTL:
+        return shown["current"], shown["forecast"]
+    from accuweather_async import get_location
+    cc, f = get_location(location_key, metric=True)
+    st.session_state.shown_forecast = shown = {
+        "key": location_key, "at": time.time(), "raw": f,
+        "current": parse_current(cc), "forecast": parse_forecast(f),
+    }
+    return shown["current"], shown["forecast"]
+
+def pick_location_ui(default_query: str = "") -> Optional[Location]:
     with st.container(border=True):
         st.subheader("Find a location")
         c1, c2 = st.columns([3,1])
@@ -109,15 +118,20 @@ def pick_location_ui(default_query: str = "") -> Optional[dict]:
             query = st.text_input("Enter city, landmark, ZIP/Postal code, or GPS (lat,lon)", value=default_query, placeholder="e.g., Seattle or 10001 or 47.60,-122.33", label_visibility="collapsed")
         with c2:
             use_ip = st.button("📍 Use my location")
-        
+
+        if not (use_ip or query):
+            return None
+        import geoindex
+        from accuweather_client import AccuError
+
         if use_ip:
             with st.spinner("Detecting your location…"):
-                guess = ip_lookup_coords()
+                guess = geoindex.ip_location()
             if guess:
                 st.info(f"Using approximate location based on IP: {guess.get('city')}, {guess.get('region')} ({guess.get('country')})")
                 try:
-                    loc = search_by_geo(guess["lat"], guess["lon"])
-                    return loc
+                    loc = geoindex.resolve_coords(guess["lat"], guess["lon"])
+                    return Location.from_json(loc) if loc else None
                 except AccuError as e:
                     st.error(str(e))
             else:
@@ -134,145 +148,125 @@ def pick_location_ui(default_query: str = "") -> Optional[dict]:
                 st.warning("No matches. Try a nearby city or ZIP code.")
                 return None
             # If multiple, let user choose
-            if isinstance(results, list) and len(results) > 1:
-                labels = []
-                for r in results:
-                    admin = r.get("AdministrativeArea", {}).get("LocalizedName", "")
-                    country = r.get("Country", {}).get("LocalizedName", "")
-                    name = r.get("LocalizedName", r.get("EnglishName", ""))
-                    labels.append(f"{name}, {admin}, {country}  ·  Key: {r.get('Key')}")
+            if len(results) > 1:
+                labels = [f"{r.name}, {r.admin}, {r.country}  ·  Key: {r.key}" for r in results]
                 idx = st.selectbox("Did you mean…", options=list(range(len(labels))), format_func=lambda i: labels[i])
                 return results[idx]
-            # If single item or geoposition
-            if isinstance(results, list):
-                return results[0]
-            return results
+            return results[0]
     return None
 
-def daily_forecasts_to_df(dfs):
+@metrics.instrument("render")
+def daily_forecasts_to_df(days: Iterable[Day]):
+    import pandas as pd
     return pd.DataFrame([{
-        "date": fmt_dt(d.get("Date","")),
-        "min": d.get("Temperature",{}).get("Minimum",{}).get("Value"),
-        "max": d.get("Temperature",{}).get("Maximum",{}).get("Value"),
-        "day": d.get("Day",{}).get("IconPhrase"),
-        "night": d.get("Night",{}).get("IconPhrase")
-    } for d in dfs])
-
-def df_to_xml(df: pd.DataFrame, root_tag="Forecast", row_tag="Day"):
-    lines = [f"<{root_tag}>"]
-    for _, row in df.iterrows():
-        lines.append(f"  <{row_tag}>")
-        for col, val in row.items():
-            text = "" if pd.isna(val) else str(val)
-            lines.append(f"    <{col}>{xml_escape(text)}</{col}>")
-        lines.append(f"  </{row_tag}>")
-    lines.append(f"</{root_tag}>")
-    return "\n".join(lines)
-
-def df_to_pdf_bytes(df: pd.DataFrame, title="Weather Forecast"):
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=letter)
-    width, height = letter
-    x = 40
-    y = height - 50
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(x, y, title)
-    y -= 20
-    c.setFont("Helvetica", 10)
-    
-    headers = list(df.columns)
-    c.drawString(x, y, " | ".join(headers))
-    y -= 15
-    c.line(x, y, width - x, y)
-    y -= 15
-    
-    for _, row in df.iterrows():
-        line = " | ".join("" if pd.isna(v) else str(v) for v in row.tolist())
-        if y < 50:
-            c.showPage()
-            y = height - 50
-        c.drawString(x, y, line)
-        y -= 15
-    c.showPage()
-    c.save()
-    pdf = buf.getvalue()
-    buf.close()
-    return pdf
-
-tabs = st.tabs(["Search", "Saved Requests"])
+        "date": fmt_dt(d.date),
+        "min": d.min,
+        "max": d.max,
+        "day": d.day_phrase,
+        "night": d.night_phrase
+    } for d in days])
+
+@st.cache_data(show_spinner=False, ttl=60)
+def _analytics_tables():
+    import analytics
+    labels = analytics.location_labels()
+    tables = {
+        "weekly": analytics.weekly_summary(analytics.iter_days()),
+        "precip": analytics.precipitation_days(analytics.iter_days()),
+        "drift": analytics.forecast_drift(analytics.iter_revisions()),
+    }
+    for t in tables.values():
+        if not t.empty:
+            t.insert(0, "location", t["location_key"].astype(str).map(labels).fillna(t["location_key"].astype(str)))
+    return int(tables["precip"]["days"].sum()), tables
+
+def _refresh(**selection):
+    import refresh
+    return refresh.refresh(**selection)
+
+def _export_bytes(fmt: str, title: Optional[str] = None, **query) -> bytes:
+    # Stream through a temp file; Streamlit needs the finished bytes for download_button
+    with tempfile.TemporaryFile() as fh:
+        export(fmt, fh, title=title, **query)
+        fh.seek(0)
+        return fh.read()
+
+HISTORY_SPANS = {"24 hours": 86400, "30 days": 30 * 86400, "1 year": 365 * 86400}
 
-    
-with tabs[0]:
+@st.cache_data(show_spinner=False, ttl=300)
+def _history(location_key: str, seconds: int):
+    # Long spans come from the hourly/daily rollups, never the raw rows
+    import archive
+    end = int(time.time())
+    return archive.series(location_key, end - seconds, end)
+
+SAVED_PAGE_SIZE = 25
+
+def _search_tab():
     loc = pick_location_ui()
     if loc:
-        location_key = loc.get("Key")
-        header = f"{loc.get('LocalizedName', loc.get('EnglishName', 'Selected'))}"
-        admin = loc.get("AdministrativeArea", {}).get("LocalizedName", "")
-        country = loc.get("Country", {}).get("LocalizedName", "")
+        location_key = loc.key
+        header = loc.name or "Selected"
+        admin = loc.admin
+        country = loc.country
         st.markdown(f"### **{header}**  \n{admin}, {country}  \nLocation Key: `{location_key}`")
 
-        # Current conditions
+        # Count one view per session per location for the pre-warmer
+        seen = st.session_state.setdefault("logged_keys", set())
+        if location_key not in seen:
+            log_access(location_key)
+            seen.add(location_key)
+
+        # Current conditions + forecast, fetched concurrently
+        from accuweather_client import AccuError
         try:
-            cc = _get_current(location_key)
+            cc, f = _get_current_and_forecast(location_key)
         except AccuError as e:
             st.error(str(e))
             st.stop()
 
-        if isinstance(cc, list) and cc:
-            c = cc[0]
-            icon_no = c.get("WeatherIcon", 1)
-            text = c.get("WeatherText", "")
-            temp_c = c.get("Temperature", {}).get("Metric", {}).get("Value")
-            realfeel_c = c.get("RealFeelTemperature", {}).get("Metric", {}).get("Value")
-            humidity = c.get("RelativeHumidity")
-            wind = c.get("Wind", {}).get("Speed", {}).get("Metric", {}).get("Value")
-            uv = c.get("UVIndex")
-
+        if cc:
             st.markdown("---")
             colA, colB = st.columns([1,2])
             with colA:
-                st.markdown(f"# {icon_emoji(icon_no)}")
-                if temp_c is not None:
-                    st.markdown(f"## {temp_c:.0f}°C")
-                if text:
-                    st.caption(text)
+                st.markdown(f"# {icon_emoji(cc.icon)}")
+                if cc.temp_c is not None:
+                    st.markdown(f"## {cc.temp_c:.0f}°C")
+                if cc.text:
+                    st.caption(cc.text)
             with colB:
-                st.metric("RealFeel®", f"{realfeel_c:.0f}°C" if realfeel_c is not None else "—")
-                st.metric("Humidity", f"{humidity}%" if humidity is not None else "—")
-                st.metric("Wind", f"{wind} km/h" if wind is not None else "—")
-                st.metric("UV Index", uv if uv is not None else "—")
+                st.metric("RealFeel®", f"{cc.realfeel_c:.0f}°C" if cc.realfeel_c is not None else "—")
+                st.metric("Humidity", f"{cc.humidity}%" if cc.humidity is not None else "—")
+                st.metric("Wind", f"{cc.wind_kmh} km/h" if cc.wind_kmh is not None else "—")
+                st.metric("UV Index", cc.uv if cc.uv is not None else "—")
         else:
             st.info("No current conditions available.")
 
         # Forecast + Save controls
-        try:
-            f = _get_forecast(location_key)
-        except AccuError as e:
-            st.error(str(e))
-            st.stop()
-
         st.markdown("### 5-Day Forecast")
-        dfs = f.get("DailyForecasts", []) if isinstance(f, dict) else []
-        if dfs:
-            rows = len(dfs)
-            cols = st.columns(rows)
-            for i, d in enumerate(dfs):
-                with cols[i]:
-                    date_lbl = fmt_dt(d.get("Date", ""))
-                    min_c = d.get("Temperature", {}).get("Minimum", {}).get("Value")
-                    max_c = d.get("Temperature", {}).get("Maximum", {}).get("Value")
-                    day_icon = d.get("Day", {}).get("Icon", 1)
-                    night_icon = d.get("Night", {}).get("Icon", 33)
-                    day_phrase = d.get("Day", {}).get("IconPhrase", "")
-                    night_phrase = d.get("Night", {}).get("IconPhrase", "")
-                    st.markdown(f"**{date_lbl}**")
-                    st.markdown(f"{icon_emoji(day_icon)}  **Day**: {day_phrase}")
-                    st.markdown(f"{icon_emoji(night_icon)}  **Night**: {night_phrase}")
-                    st.markdown(f"**Min/Max**: {min_c:.0f}°C / {max_c:.0f}°C")
+        if f.days:
+            cols = st.columns(len(f.days))
+            for col, d in zip(cols, f.days):
+                with col:
+                    st.markdown(f"**{fmt_dt(d.date)}**")
+                    st.markdown(f"{icon_emoji(d.day_icon)}  **Day**: {d.day_phrase}")
+                    st.markdown(f"{icon_emoji(d.night_icon)}  **Night**: {d.night_phrase}")
+                    st.markdown(f"**Min/Max**: {d.min:.0f}°C / {d.max:.0f}°C")
         else:
             st.info("No forecast data available.")
 
-        
+        # Archived observations (archive.py); nothing is queried or imported until toggled on
+        if st.toggle("Show observed history", key="show_history"):
+            span = st.radio("Range", list(HISTORY_SPANS), horizontal=True, key="history_span")
+            hist = _history(location_key, HISTORY_SPANS[span])
+            if hist["points"]:
+                import pandas as pd
+                df = pd.DataFrame(hist["points"])
+                df["time"] = pd.to_datetime(df["time"], unit="s")
+                st.line_chart(df.set_index("time")[["temp_min", "temp_mean", "temp_max"]])
+                st.caption(f"{len(df)} {hist['resolution']} point(s), °C")
+            else:
+                st.caption("No observations archived for this location yet (`python archive.py` or `ACCU_ARCHIVE=1`).")
 
         # Simple persistence block
         st.subheader("Save this forecast (CREATE)")
@@ -286,30 +280,78 @@ with tabs[0]:
             if start_date > end_date:
                 st.error("Start date must be ≤ end date.")
             else:
+                # Storage keeps the full payload of the forecast on screen
+                raw = st.session_state.shown_forecast["raw"]
                 label = f"{header} - {admin}, {country}"
-                rid = save_request(location_key, label, str(start_date), str(end_date), units, f)
+                rid = save_request(location_key, label, str(start_date), str(end_date), units, raw)
                 st.success(f"Saved request #{rid} for {label}.")
 
-with tabs[1]:
+def _saved_tab():
     st.subheader("Saved Requests")
-    reqs = list_requests()
+    with st.expander("Filters"):
+        f1, f2 = st.columns(2)
+        with f1:
+            flt_label = st.text_input("Location starts with", key="flt_label")
+        with f2:
+            flt_key = st.text_input("Location key", key="flt_key")
+        use_dates = st.checkbox("Filter by dates", key="flt_use_dates")
+        flt_from = flt_to = None
+        if use_dates:
+            d1, d2 = st.columns(2)
+            with d1:
+                flt_from = st.date_input("From", key="flt_from", value=date.today())
+            with d2:
+                flt_to = st.date_input("To", key="flt_to", value=date.today())
+    filters = {"label": flt_label.strip() or None, "location_key": flt_key.strip() or None,
+               "date_from": flt_from, "date_to": flt_to}
+
+    # Keyset pagination: stack of "before id" cursors, reset whenever the filters change
+    if st.session_state.get("saved_filters") != filters:
+        st.session_state.saved_filters = filters
+        st.session_state.saved_cursors = [None]
+    cursors = st.session_state.saved_cursors
+    reqs, next_cursor = list_requests_page(SAVED_PAGE_SIZE, cursors[-1], **filters)
+    total = count_requests(**filters)
+
+    p1, p2, p3 = st.columns([1, 2, 1])
+    with p1:
+        if st.button("← Newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with p2:
+        st.caption(f"{total} saved request(s) · page {len(cursors)} of {max(1, -(-total // SAVED_PAGE_SIZE))}")
+    with p3:
+        if st.button("Older →", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+
     if not reqs:
-        st.info("No saved requests yet.")
+        st.info("No saved requests yet." if not any(filters.values()) else "No saved requests match these filters.")
     else:
         display = [f"#{r[0]} — {r[1]} [{r[2]} → {r[3]}] ({r[4]})" for r in reqs]
         idx = st.selectbox("Select", options=list(range(len(display))), format_func=lambda i: display[i])
         rid = reqs[idx][0]
 
+        if st.button("🔄 Refresh forecast", key=f"refresh_btn_{rid}"):
+            with st.spinner("Fetching the latest forecast…"):
+                result = _refresh(request_ids=[rid])
+            if result["failed"]:
+                st.error(f"Refresh failed: {next(iter(result['errors'].values()))}")
+            else:
+                changed = [c for days in result["changes"].values() for c in days]
+                if changed:
+                    st.success(f"{result['days_changed']} day(s) changed, {result['days_added']} added.")
+                    st.dataframe(changed, use_container_width=True, hide_index=True)
+                else:
+                    st.info("Forecast unchanged.")
+
         row = get_requests(rid)
         if row:
             st.markdown(f"**Location:** {row[2]}  \\n**Dates:** {row[3]} → {row[4]}  \\n**Units:** {row[5]}")
-            try:
-                data = json.loads(row[6]) if row[6] else {}
-            except Exception:
-                data = {}
-            dfs = data.get("DailyForecasts", []) if isinstance(data, dict) else []
-            if dfs:
-                df = daily_forecasts_to_df(dfs)
+            data = row[6] or {}
+            forecast_days = parse_forecast(data).days
+            if forecast_days:
+                df = daily_forecasts_to_df(forecast_days)
                 st.dataframe(df, use_container_width=True)
 
             st.divider()
@@ -333,16 +375,11 @@ with tabs[1]:
                     if new_end > old_end:
                         st.error(f"You can only update within the original end date ({old_end}).")
                         st.stop()
-                    try:
-                        current_json = json.loads(row[6]) if row[6] else {}
-                    except Exception:
-                        current_json = {}
-                    sliced = _slice_forecast_json(current_json, str(new_start), str(new_end))
-                    days = sliced.get("DailyForecasts", [])
+                    days = get_request_days(rid, new_start, new_end)
                     if not days:
                         st.warning("No days remain in that range. Nothing to update.")
                     else:
-                        update_request(rid, str(new_start), str(new_end), sliced)
+                        update_request(rid, str(new_start), str(new_end))
                         st.success(f"Updated! Kept {len(days)} day(s) within {new_start} → {new_end}.")
 
             # DELETE
@@ -355,21 +392,195 @@ with tabs[1]:
             # EXPORT
             with col3:
                 st.markdown("**Export**")
-                if dfs:
+                if forecast_days:
                     fmt = st.selectbox("Format", ["CSV", "JSON", "XML", "PDF"], index=0)
                     fname_base = f"weather_request_{row[0]}"
-                    if fmt == "CSV":
-                        csv_bytes = df.to_csv(index=False).encode()
-                        st.download_button("Download CSV", csv_bytes, file_name=f"{fname_base}.csv", mime="text/csv")
-                    elif fmt == "JSON":
+                    if fmt == "JSON":
                         json_bytes = json.dumps(data, indent=2).encode()
                         st.download_button("Download JSON", json_bytes, file_name=f"{fname_base}.json", mime="application/json")
-                    elif fmt == "XML":
-                        xml_str = df_to_xml(df, root_tag="Forecast", row_tag="Day")
-                        st.download_button("Download XML", xml_str.encode(), file_name=f"{fname_base}.xml", mime="application/xml")
-                    elif fmt == "PDF":
-                        pdf_bytes = df_to_pdf_bytes(df, title=f"Forecast for {row[2]}")
-                        st.download_button("Download PDF", pdf_bytes, file_name=f"{fname_base}.pdf", mime="application/pdf")
+                    else:
+                        _, mime, ext = EXPORT_FORMATS[fmt.lower()]
+                        payload = _export_bytes(fmt.lower(), title=f"Forecast for {row[2]}", request_ids=[rid])
+                        st.download_button(f"Download {fmt}", payload, file_name=f"{fname_base}.{ext}", mime=mime)
+
+        # Export every request matching the filters, one row per request per day
+        st.divider()
+        st.markdown("**Export all matching requests**")
+        e1, e2 = st.columns([1, 2])
+        with e1:
+            bulk_fmt = st.selectbox("Format", ["CSV", "JSONL", "XML", "PDF"], key="bulk_fmt")
+        with e2:
+            if st.button(f"Prepare export of {total} request(s)"):
+                with st.spinner("Exporting…"):
+                    payload = _export_bytes(bulk_fmt.lower(), title="Saved forecasts", **filters)
+                    st.session_state.bulk_export = (bulk_fmt, filters, payload)
+            prepared = st.session_state.get("bulk_export")
+            if prepared and prepared[:2] == (bulk_fmt, filters):
+                _, mime, ext = EXPORT_FORMATS[bulk_fmt.lower()]
+                st.download_button(f"Download {bulk_fmt}", prepared[2], file_name=f"weather_requests.{ext}", mime=mime)
+
+        # One forecast fetch per distinct location across the matching requests
+        st.markdown("**Refresh all matching requests**")
+        if st.button(f"Refresh {total} request(s)"):
+            with st.spinner("Refreshing forecasts…"):
+                result = _refresh(**filters)
+            msg = (f"{result['fetched']} location(s) fetched for {result['requests']} request(s): "
+                   f"{result['days_changed']} day(s) changed, {result['days_added']} added.")
+            if result["failed"]:
+                st.warning(f"{msg} {result['failed']} location(s) failed.")
+            else:
+                st.success(msg)
+
+def _analytics_tab():
+    st.subheader("Forecast analytics")
+    n_days, tables = _analytics_tables()
+    if not n_days:
+        st.info("Save some forecasts to see analytics.")
+    else:
+        st.caption(f"{n_days} forecast-day(s) across saved requests")
+        st.markdown("**Weekly temperatures per location**")
+        st.dataframe(tables["weekly"], use_container_width=True, hide_index=True)
+        st.markdown("**Precipitation days**")
+        st.dataframe(tables["precip"], use_container_width=True, hide_index=True)
+        st.markdown("**Forecast drift between saves** (°, same location and day)")
+        if tables["drift"].empty:
+            st.caption("No location has been saved more than once with a changed forecast yet.")
+        else:
+            st.dataframe(tables["drift"], use_container_width=True, hide_index=True)
+
+# Watchlist dashboard: every watched site's current conditions and forecast
+# fetched in parallel (shared cache, coalescing and rate limiter), the table
+# redrawn as each one arrives
+WATCH_CONCURRENCY = int(os.getenv("WATCHLIST_CONCURRENCY", "8"))
+
+def _add_watch_lines():
+    # Button callback: runs before the rerun, so the list below is already updated
+    from accuweather_client import AccuError
+    found, missing = [], []
+    for line in st.session_state.watch_add.splitlines():
+        q = line.strip()
+        if not q:
+            continue
+        try:
+            results = _search_location(q)
+        except AccuError as e:
+            missing.append(f"{q} ({e})")
+            continue
+        if results:
+            found.append((results[0].key, results[0].label))
+        else:
+            missing.append(q)
+    add_watch(found)
+    st.session_state.watch_add = ""
+    st.session_state.watch_msg = (len(found), missing)
+
+def _remove_watch_selected():
+    remove_watch(st.session_state.watch_remove)
+    st.session_state.watch_remove = []
+
+def _watch_row(label: str, key: str, result) -> dict:
+    row = {"location": label, "icon": "", "now °C": None, "conditions": "…", "humidity %": None,
+           "wind km/h": None, "today min °C": None, "today max °C": None, "next days": "", "key": key}
+    if result is None:
+        return row
+    if isinstance(result, Exception):
+        row["conditions"] = f"⚠️ {result}"
+        return row
+    c, days = parse_current(result[0]), parse_forecast(result[1]).days
+    if c:
+        row.update({"icon": icon_emoji(c.icon), "now °C": c.temp_c, "conditions": c.text or "—",
+                    "humidity %": c.humidity, "wind km/h": c.wind_kmh})
+    else:
+        row["conditions"] = "—"
+    if days:
+        row.update({"today min °C": days[0].min, "today max °C": days[0].max,
+                    "next days": " ".join(icon_emoji(d.day_icon) for d in days[1:])})
+    return row
+
+def _watchlist_tab():
+    from accuweather_async import iter_many, run
+
+    st.subheader("Watchlist")
+    watched = list_watchlist()
+    with st.expander("Edit watchlist", expanded=not watched):
+        st.text_area("Add locations, one per line (city, ZIP/postal code or lat,lon)", key="watch_add",
+                     placeholder="Seattle\n10001\n37.77,-122.42")
+        st.button("Add to watchlist", on_click=_add_watch_lines)
+        if watched:
+            labels = dict(watched)
+            st.multiselect("Remove", options=list(labels), format_func=labels.get, key="watch_remove")
+            st.button("Remove selected", on_click=_remove_watch_selected)
+    if "watch_msg" in st.session_state:
+        added, missing = st.session_state.pop("watch_msg")
+        if added:
+            st.success(f"Added {added} location(s).")
+        if missing:
+            st.warning("No match for: " + "; ".join(missing))
+    if not watched:
+        st.info("Add locations to compare them side by side.")
+        return
+
+    # Rows start as placeholders in watchlist order and fill in as results land
+    labels = dict(watched)
+    rows = {key: _watch_row(label, key, None) for key, label in watched}
+    progress = st.progress(0.0, text=f"Loading {len(rows)} location(s)…")
+    table = st.empty()
+    table.dataframe(list(rows.values()), use_container_width=True, hide_index=True)
+    failed = []
+    t0 = time.perf_counter()
+
+    async def stream():
+        done, drawn = 0, 0.0
+        async for key, result in iter_many(labels, metric=True, concurrency=WATCH_CONCURRENCY):
+            done += 1
+            rows[key] = _watch_row(labels[key], key, result)
+            if isinstance(result, Exception):
+                failed.append(key)
+            # Redraw at most ~10 times a second; the last result always draws
+            if done == len(rows) or time.perf_counter() - drawn >= 0.1:
+                table.dataframe(list(rows.values()), use_container_width=True, hide_index=True)
+                progress.progress(done / len(rows), text=f"{done}/{len(rows)} location(s)")
+                drawn = time.perf_counter()
+
+    run(stream(), workers=2 * WATCH_CONCURRENCY)  # current + forecast per location
+    progress.empty()
+    st.caption(f"{len(rows)} location(s) in {time.perf_counter() - t0:.1f}s"
+               + (f" · {len(failed)} failed" if failed else ""))
+
+# Only the selected tab's body runs, so a rerun on Search never touches the
+# saved-request queries or the analytics aggregates (and their imports)
+tabs = st.tabs(["Search", "Watchlist", "Saved Requests", "Analytics"], key="main_tab", on_change="rerun")
+for tab, render in zip(tabs, (_search_tab, _watchlist_tab, _saved_tab, _analytics_tab)):
+    with tab:
+        if tab.open:
+            render()
 
 st.markdown("---")
-st.caption("Tip: Enter GPS like `37.7749,-122.4194` for precision.")
\ No newline at end of file
+st.caption("Tip: Enter GPS like `37.7749,-122.4194` for precision.")
+
+metrics.observe("app_rerun", time.perf_counter() - _rerun_t0)
+if st.session_state._profiler is not None:
+    st.session_state.last_profile = metrics.stop_profile(st.session_state._profiler)
+    st.session_state._profiler = None
+
+if _diagnostics:
+    from accuweather_client import coalescing_stats, budget_stats
+    import cache
+    import http_session
+
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.caption(f"Last rerun: {(time.perf_counter() - _rerun_t0) * 1000:.0f} ms")
+        snap = metrics.snapshot()
+        if snap:
+            import pandas as pd
+            st.dataframe(pd.DataFrame(snap).drop(columns=["total_s"]), use_container_width=True, hide_index=True)
+        st.markdown("**Upstream HTTP**")
+        st.json(http_session.stats(), expanded=False)
+        st.markdown("**Cache / coalescing / budget**")
+        st.json({"cache": cache.get_cache().stats(), "coalescing": coalescing_stats(), "budget": budget_stats()},
+                expanded=False)
+        st.download_button("Prometheus metrics", metrics.render_prometheus(), file_name="weather_metrics.prom",
+                           mime="text/plain")
+        if st.session_state.get("last_profile"):
+            st.markdown("**cProfile (this rerun)**")
+            st.code(st.session_state.last_profile, language="text")
\ No newline at end of file
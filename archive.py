@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import periodic
+import ratelimit
+from accuweather_client import current_conditions
+from db_ops import record_observations, rollup_observations, prune_observations, observation_series
+from models import parse_current
+from periodic import PeriodicWorker, run_budgeted
+from prewarm import popular_keys
+
+# Archives current conditions for tracked locations (watchlist, saved and
+# frequently viewed keys, as for the pre-warmer) so charts have a history.
+# Each pass appends one batch to `observations`, folds finished hours and
+# days into observations_hourly/_daily and prunes every level past its
+# retention. Range queries pick the coarsest level that suits the span, so
+# a year-long chart reads ~365 daily rows.
+#
+#   python archive.py                  (every INTERVAL seconds)
+#   python archive.py --once
+#   python archive.py --series 349727 --days 365
+
+log = logging.getLogger("archive")
+
+TOP_N = 50
+WORKERS = 4
+INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", "900"))
+# A bucket is rolled up this long after it ends, leaving room for cached/late observations
+SETTLE = 900
+# Days kept per level; 0 keeps forever
+RETENTION = {
+    "raw": int(os.getenv("ARCHIVE_RAW_DAYS", "14")),
+    "hourly": int(os.getenv("ARCHIVE_HOURLY_DAYS", "180")),
+    "daily": int(os.getenv("ARCHIVE_DAILY_DAYS", "0")),
+}
+# Longest span served from each level
+MAX_SPAN = {"raw": 2 * 86400, "hourly": 90 * 86400}
+POINT_FIELDS = ("time", "n", "temp_min", "temp_max", "temp_mean", "humidity_mean", "wind_max")
+
+
+def _observe(key: str) -> Optional[Tuple]:
+    # Served from the response cache when fresh; the same EpochTime is only stored once
+    with ratelimit.priority(ratelimit.BACKGROUND):
+        c = parse_current(current_conditions(key))
+    if c is None or c.observed_at is None:
+        return None
+    return (key, c.observed_at, c.temp_c, c.realfeel_c, c.humidity, c.wind_kmh, c.icon, c.text)
+
+
+def maintain(now: Optional[float] = None) -> Dict[str, Any]:
+    return {
+        "rolled": rollup_observations(SETTLE, now),
+        "pruned": prune_observations(RETENTION["raw"], RETENTION["hourly"], RETENTION["daily"], now),
+    }
+
+
+def run_once(limit: int = TOP_N, workers: int = WORKERS) -> Dict[str, Any]:
+    keys = popular_keys(limit)
+    result = {"keys": len(keys), "recorded": 0, "errors": 0, "quota_stopped": False}
+    rows = [row for _, row in run_budgeted(keys, _observe, workers, result, log) if row]
+    if rows:
+        result["recorded"] = record_observations(rows)
+    result.update(maintain())
+    return result
+
+
+def resolution_for(start: int, end: int, now: Optional[float] = None) -> str:
+    # Finest level that covers the span and still holds data that far back
+    now = now or time.time()
+    for level in ("raw", "hourly"):
+        kept = RETENTION[level]
+        if end - start <= MAX_SPAN[level] and (not kept or start >= now - kept * 86400):
+            return level
+    return "daily"
+
+
+def series(location_key: str, start: int, end: int, resolution: Optional[str] = None) -> Dict[str, Any]:
+    """Observed history for charting: {"resolution", "points": [{time, n, temp_min, ...}]}."""
+    resolution = resolution or resolution_for(start, end)
+    rows = observation_series(location_key, start, end, resolution)
+    return {"resolution": resolution, "points": [dict(zip(POINT_FIELDS, r)) for r in rows]}
+
+
+def make_worker(interval: float = INTERVAL, limit: int = TOP_N, workers: int = WORKERS) -> PeriodicWorker:
+    return PeriodicWorker("archiver", lambda: run_once(limit, workers), interval, log)
+
+
+def start_background(**kwargs) -> PeriodicWorker:
+    # Idempotent: one archiver thread per process
+    return periodic.start_background("archiver", lambda: make_worker(**kwargs))
+
+
+def main():
+    p = periodic.make_parser("Archive current conditions and maintain the hourly/daily rollups", INTERVAL, TOP_N, WORKERS)
+    p.add_argument("--series", metavar="KEY", help="print the archived history of a location and exit")
+    p.add_argument("--days", type=float, default=30, help="history length for --series")
+    p.add_argument("--resolution", choices=("raw", "hourly", "daily"), help="default: picked from --days")
+    args = periodic.parse_args(p)
+    if args.series:
+        end = int(time.time())
+        print(json.dumps(series(args.series, end - int(args.days * 86400), end, args.resolution), indent=2))
+        return
+    periodic.run_cli(make_worker(args.interval, args.top, args.workers), args.once)
+
+
+if __name__ == "__main__":
+    main()
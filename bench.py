@@ -0,0 +1,589 @@
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Micro-benchmarks for the hot paths. Each command prints a JSON result.
+#   python bench.py db --readers 4 --writers 2 --seconds 5
+#   python bench.py export --rows 100000
+#   python bench.py client --threads 8 --latency-ms 50     (against stub_accuweather)
+#   python bench.py cache
+#   python bench.py startup                                (import time, first run vs. rerun)
+#   python bench.py models --locations 2000                (raw payload dicts vs. models.py)
+#
+# `suite` runs them all and saves the results under bench_results/ named by
+# commit; `compare` diffs two result files and exits 1 on regressions:
+#   python bench.py suite
+#   python bench.py compare bench_results/abc1234.json bench_results/def5678.json
+
+SAMPLE_FORECAST = {
+    "Headline": {"Text": "Pleasant this weekend", "Category": "mild"},
+    "DailyForecasts": [
+        {
+            "Date": f"2024-05-0{i + 1}T07:00:00-04:00",
+            "EpochDate": 1714561200 + i * 86400,
+            "Temperature": {
+                "Minimum": {"Value": 10.0 + i, "Unit": "C", "UnitType": 17},
+                "Maximum": {"Value": 20.0 + i, "Unit": "C", "UnitType": 17},
+            },
+            "Day": {"Icon": 2, "IconPhrase": "Mostly sunny", "HasPrecipitation": False},
+            "Night": {"Icon": 35, "IconPhrase": "Partly cloudy", "HasPrecipitation": False},
+        }
+        for i in range(5)
+    ],
+}
+
+
+def _run_threads(readers, writers, seconds, read_op, write_op):
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def loop(kind, op):
+        n = errors = 0
+        while time.monotonic() < stop:
+            try:
+                op(n)
+                n += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts[kind] += n
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=loop, args=("reads", read_op)) for _ in range(readers)]
+    threads += [threading.Thread(target=loop, args=("writes", write_op)) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counts["reads_per_s"] = round(counts["reads"] / seconds, 1)
+    counts["writes_per_s"] = round(counts["writes"] / seconds, 1)
+    return counts
+
+
+# weather_requests as it was before pooling/normalisation: one JSON blob per row
+LEGACY_SCHEMA = """
+    CREATE TABLE weather_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        location_key TEXT NOT NULL,
+        location_label TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        units TEXT NOT NULL,
+        data_json TEXT NOT NULL
+    )
+"""
+
+
+def _legacy_ops(path):
+    # The original pattern: fresh connection, default rollback journal, commit+close per call
+    def write(n):
+        conn = sqlite3.connect(path)
+        conn.execute("""
+            INSERT INTO weather_requests (location_key, location_label, start_date, end_date, units, data_json)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (str(n % 50), f"City {n % 50}", "2024-05-01", "2024-05-05", "metric", json.dumps(SAMPLE_FORECAST)))
+        conn.commit()
+        conn.close()
+
+    def read(n):
+        conn = sqlite3.connect(path)
+        conn.execute("SELECT id, location_label, start_date, end_date, units FROM weather_requests ORDER BY id DESC").fetchall()
+        conn.close()
+
+    return read, write
+
+
+def _pooled_ops():
+    import db_ops
+
+    def write(n):
+        db_ops.save_request(str(n % 50), f"City {n % 50}", "2024-05-01", "2024-05-05", "metric", SAMPLE_FORECAST)
+
+    def read(n):
+        db_ops.list_requests()
+
+    return read, write
+
+
+def bench_db(readers, writers, seconds, seed_rows=1000):
+    import db
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("legacy", "pooled"):
+            path = os.path.join(tmp, f"{mode}.db")
+            if mode == "legacy":
+                conn = sqlite3.connect(path)
+                conn.execute(LEGACY_SCHEMA)
+                conn.close()
+                read, write = _legacy_ops(path)
+            else:
+                db.DB_FILE = path
+                db.init_db()
+                read, write = _pooled_ops()
+            for i in range(seed_rows):
+                write(i)
+            results[mode] = _run_threads(readers, writers, seconds, read, write)
+    return results
+
+
+def _seed_requests(n_requests, n_locations=500):
+    import db_ops
+
+    batch = []
+    for i in range(n_requests):
+        key = str(i % n_locations)
+        batch.append((key, f"City {key}", "2024-05-01", "2024-05-05", "metric", SAMPLE_FORECAST))
+        if len(batch) == 1000:
+            db_ops.save_requests_bulk(batch)
+            batch = []
+    if batch:
+        db_ops.save_requests_bulk(batch)
+
+
+def bench_export(rows, formats):
+    # rows/sec and peak Python heap per format for an export of `rows` request-days
+    import tracemalloc
+    import db
+    import export
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "export.db")
+        db.init_db()
+        _seed_requests(rows // len(SAMPLE_FORECAST["DailyForecasts"]))
+        for fmt in formats:
+            out_path = os.path.join(tmp, f"out.{fmt}")
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            with open(out_path, "wb") as fh:
+                n = export.export(fmt, fh)
+            elapsed = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[fmt] = {
+                "rows": n, "seconds": round(elapsed, 3), "rows_per_s": round(n / elapsed, 1),
+                "peak_mb": round(peak / 1e6, 2), "file_mb": round(os.path.getsize(out_path) / 1e6, 2),
+            }
+    return results
+
+
+_client_tmp = None
+
+
+def _use_stub(**stub_config):
+    # Point the client at a fresh in-process stub, with the local budget lifted.
+    # Client modules read their settings on first import, so their files live in
+    # one scratch dir for the whole process. Returns (stub, stop).
+    global _client_tmp
+    import stub_accuweather
+
+    url, stub, stop = stub_accuweather.start_in_thread(**stub_config)
+    if _client_tmp is None:
+        _client_tmp = tempfile.mkdtemp(prefix="weather-bench-")
+        atexit.register(shutil.rmtree, _client_tmp, True)
+        os.environ.update({
+            "ACCUWEATHER_API_KEY": "bench",
+            "ACCU_RATE_PER_SEC": "1000000", "ACCU_BURST": "1000000", "ACCU_DAILY_QUOTA": "1000000000",
+            "ACCU_QUOTA_FILE": os.path.join(_client_tmp, "quota.db"),
+            "ACCU_CACHE_FILE": os.path.join(_client_tmp, "cache.db"),
+            "HTTP_BACKOFF_BASE": os.getenv("HTTP_BACKOFF_BASE", "0.05"),
+        })
+    import accuweather_client
+    accuweather_client.ACCU_API = url
+    accuweather_client.API_KEY = "bench"
+    return stub, stop
+
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+def bench_client(threads, seconds, keys=50, **stub_config):
+    # Uncached upstream throughput: every call goes through retries, pooling and the stub
+    stub, stop = _use_stub(**stub_config)
+    import accuweather_client as accu
+    import cache
+    import http_session
+
+    cache.set_cache(cache.NullCache())
+    http_session.reset_stats()
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    end = time.monotonic() + seconds
+
+    def loop(tid):
+        mine, n, failed = [], tid, 0
+        while time.monotonic() < end:
+            t0 = time.perf_counter()
+            try:
+                accu.forecast_5day(str(n % keys))
+                mine.append(time.perf_counter() - t0)
+            except accu.AccuError:
+                failed += 1
+            n += threads
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    stop()
+    http = http_session.stats().get("forecast", {})
+    cache.set_cache(None)
+    return {
+        "calls": len(latencies), "errors": errors[0],
+        "calls_per_s": round(len(latencies) / seconds, 1),
+        **_percentiles(latencies),
+        "retries": http.get("retries", 0), "new_connections": http.get("new_connections", 0),
+        "stub": stub.stats,
+    }
+
+
+def bench_cache(seconds, keys=50):
+    # Hit path of forecast_5day per cache backend: no upstream calls after warm-up
+    results = {}
+    stub, stop = _use_stub()
+    import accuweather_client as accu
+    import cache
+
+    for name, backend in (("memory", cache.MemoryCache()),
+                          ("sqlite", cache.SQLiteCache(os.path.join(_client_tmp, f"hits-{time.time_ns()}.db")))):
+        cache.set_cache(backend)
+        for k in range(keys):
+            accu.forecast_5day(str(k))
+        n, latencies = 0, []
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            t0 = time.perf_counter()
+            accu.forecast_5day(str(n % keys))
+            latencies.append(time.perf_counter() - t0)
+            n += 1
+        results[name] = {"hits_per_s": round(n / seconds, 1), **_percentiles(latencies)}
+    stop()
+    results["upstream_calls"] = sum(s["ok"] for s in stub.stats.values())
+    cache.set_cache(None)
+    return results
+
+
+STARTUP_MODULES = ["streamlit", "db_ops", "export", "metrics", "accuweather_client", "geoindex", "analytics", "api"]
+HEAVY_DEPS = ("pandas", "numpy", "requests", "reportlab", "aiohttp")
+
+_APP_RUN = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+t0 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+t1 = time.perf_counter()
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({"first_run_ms": round((t1 - t0) * 1000, 1), "rerun_ms": round((t2 - t1) * 1000, 1),
+                  "errors": len(at.exception), "loaded": {m: m in sys.modules for m in sys.argv[2].split(",")}}))
+"""
+
+
+def _import_ms(module):
+    # Cumulative import time of `module` in a fresh interpreter (python -X importtime)
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, cwd=here)
+    for line in reversed(out.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return round(int(parts[1]) / 1000, 1)
+    return None
+
+
+def bench_startup(runs=3):
+    """Cold import cost per module and the app's first script run vs. a rerun.
+
+    `loaded` records which heavy dependencies the first run of the Search
+    tab pulled in; anything True there is paid by every cold start.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    imports = {}
+    for m in STARTUP_MODULES:
+        samples = [v for v in (_import_ms(m) for _ in range(runs)) if v is not None]
+        imports[m] = sorted(samples)[len(samples) // 2] if samples else None
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "WEATHER_DB": os.path.join(tmp, "w.db"), "ACCU_CACHE_FILE": os.path.join(tmp, "c.db")}
+        out = subprocess.run([sys.executable, "-c", _APP_RUN, os.path.join(here, "app.py"), ",".join(HEAVY_DEPS)],
+                             capture_output=True, text=True, cwd=here, env=env)
+    try:
+        app = json.loads(out.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        app = {"error": out.stderr.strip().splitlines()[-1:] or "no output"}
+    return {"imports_ms": imports, "app": app}
+
+
+def _mi(metric, imperial, unit_m="C", unit_i="F"):
+    return {"Metric": {"Value": metric, "Unit": unit_m, "UnitType": 17},
+            "Imperial": {"Value": imperial, "Unit": unit_i, "UnitType": 18}}
+
+
+# Shapes of the details=true responses the app actually receives
+def _sample_location(i):
+    return {
+        "Version": 1, "Key": str(100000 + i), "Type": "City", "Rank": 25,
+        "LocalizedName": f"City {i}", "EnglishName": f"City {i}", "PrimaryPostalCode": f"{10000 + i}",
+        "Region": {"ID": "NAM", "LocalizedName": "North America", "EnglishName": "North America"},
+        "Country": {"ID": "US", "LocalizedName": "United States", "EnglishName": "United States"},
+        "AdministrativeArea": {"ID": "NY", "LocalizedName": "New York", "EnglishName": "New York", "Level": 1,
+                               "LocalizedType": "State", "EnglishType": "State", "CountryID": "US"},
+        "TimeZone": {"Code": "EDT", "Name": "America/New_York", "GmtOffset": -4.0, "IsDaylightSaving": True},
+        "GeoPosition": {"Latitude": 40.0 + i / 1000, "Longitude": -74.0 - i / 1000,
+                        "Elevation": _mi(10.0, 33.0, "m", "ft")},
+        "IsAlias": False, "SupplementalAdminAreas": [{"Level": 2, "LocalizedName": "County", "EnglishName": "County"}],
+        "DataSets": ["AirQualityCurrentConditions", "AirQualityForecasts", "Alerts", "ForecastConfidence",
+                     "FutureRadar", "MinuteCast", "Radar"],
+        "Details": {"Key": str(100000 + i), "StationCode": "NYC", "StationGmtOffset": -4.0, "BandMap": "US",
+                    "Climo": "NYC", "LocalRadar": "", "MediaRegion": None, "Metar": "KNYC", "NXMetro": "",
+                    "NXState": "", "Population": 8000000 + i, "PrimaryWarningCountyCode": "NYC061",
+                    "PrimaryWarningZoneCode": "NYZ072", "Satellite": "EUS", "Synoptic": "72503",
+                    "MarineStation": "", "MarineStationGMTOffset": None, "VideoCode": "",
+                    "LocationStem": "us/new-york-ny/10007", "PartnerID": None, "Sources": [], "CanonicalPostalCode": "10007",
+                    "CanonicalLocationKey": str(100000 + i)},
+    }
+
+
+def _sample_current(i):
+    t = 10.0 + i % 15
+    return [{
+        "LocalObservationDateTime": "2024-05-01T09:00:00-04:00", "EpochTime": 1714568400 + i,
+        "WeatherText": "Partly sunny", "WeatherIcon": 3, "HasPrecipitation": False, "PrecipitationType": None,
+        "IsDayTime": True, "Temperature": _mi(t, t * 1.8 + 32), "RealFeelTemperature": _mi(t - 1, t * 1.8 + 30),
+        "RealFeelTemperatureShade": _mi(t - 2, t * 1.8 + 28), "RelativeHumidity": 55, "IndoorRelativeHumidity": 40,
+        "DewPoint": _mi(4.0, 39.0), "Wind": {"Direction": {"Degrees": 225, "Localized": "SW", "English": "SW"},
+                                            "Speed": _mi(12.0, 7.5, "km/h", "mi/h")},
+        "WindGust": {"Speed": _mi(20.0, 12.4, "km/h", "mi/h")}, "UVIndex": 4, "UVIndexText": "Moderate",
+        "Visibility": _mi(16.1, 10.0, "km", "mi"), "ObstructionsToVisibility": "", "CloudCover": 40,
+        "Ceiling": _mi(9144.0, 30000.0, "m", "ft"), "Pressure": _mi(1016.0, 30.0, "mb", "inHg"),
+        "PressureTendency": {"LocalizedText": "Steady", "Code": "S"},
+        "Past24HourTemperatureDeparture": _mi(1.0, 2.0), "ApparentTemperature": _mi(t, t * 1.8 + 32),
+        "WindChillTemperature": _mi(t, t * 1.8 + 32), "WetBulbTemperature": _mi(7.0, 45.0),
+        "Precip1hr": _mi(0.0, 0.0, "mm", "in"),
+        "PrecipitationSummary": {k: _mi(0.0, 0.0, "mm", "in") for k in
+                                 ("Precipitation", "PastHour", "Past3Hours", "Past6Hours", "Past9Hours",
+                                  "Past12Hours", "Past18Hours", "Past24Hours")},
+        "TemperatureSummary": {k: {"Minimum": _mi(t - 5, t * 1.8 + 23), "Maximum": _mi(t + 3, t * 1.8 + 37)}
+                               for k in ("Past6HourRange", "Past12HourRange", "Past24HourRange")},
+        "MobileLink": f"http://www.accuweather.com/en/us/city/{i}/current-weather/{100000 + i}",
+        "Link": f"http://www.accuweather.com/en/us/city/{i}/current-weather/{100000 + i}",
+    }]
+
+
+def _render_raw(loc, cc, f):
+    # The fields the app reads, via the .get() chains it used before models.py
+    c = cc[0]
+    out = [loc.get("Key"), loc.get("LocalizedName"), loc.get("AdministrativeArea", {}).get("LocalizedName", ""),
+           loc.get("Country", {}).get("LocalizedName", ""), c.get("WeatherIcon", 1), c.get("WeatherText", ""),
+           c.get("Temperature", {}).get("Metric", {}).get("Value"),
+           c.get("RealFeelTemperature", {}).get("Metric", {}).get("Value"), c.get("RelativeHumidity"),
+           c.get("Wind", {}).get("Speed", {}).get("Metric", {}).get("Value"), c.get("UVIndex")]
+    for d in f.get("DailyForecasts", []):
+        out += [d.get("Date", ""), d.get("Temperature", {}).get("Minimum", {}).get("Value"),
+                d.get("Temperature", {}).get("Maximum", {}).get("Value"), d.get("Day", {}).get("Icon", 1),
+                d.get("Day", {}).get("IconPhrase", ""), d.get("Night", {}).get("Icon", 33),
+                d.get("Night", {}).get("IconPhrase", "")]
+    return out
+
+
+def _render_models(loc, cc, f):
+    out = [loc.key, loc.name, loc.admin, loc.country, cc.icon, cc.text, cc.temp_c, cc.realfeel_c, cc.humidity,
+           cc.wind_kmh, cc.uv]
+    for d in f.days:
+        out += [d.date, d.min, d.max, d.day_icon, d.day_phrase, d.night_icon, d.night_phrase]
+    return out
+
+
+def bench_models(locations=2000):
+    """Raw response dicts vs. models.py at response-cache scale.
+
+    `locations` x (search result, current conditions, forecast) payloads,
+    decoded from distinct JSON bodies as the caches hold them. Measures the
+    retained heap, the pickle round-trip st.cache_data does on every hit,
+    and reading the fields the UI renders.
+    """
+    import pickle
+    import tracemalloc
+    import models
+
+    bodies = [(json.dumps(_sample_location(i)), json.dumps(_sample_current(i)), json.dumps(SAMPLE_FORECAST))
+              for i in range(locations)]
+
+    def decode():
+        return [(json.loads(a), json.loads(b), json.loads(c)) for a, b, c in bodies]
+
+    def parse():
+        return [(models.Location.from_json(json.loads(a)), models.parse_current(json.loads(b)),
+                 models.parse_forecast(json.loads(c))) for a, b, c in bodies]
+
+    results = {"locations": locations, "payloads": locations * 3}
+    for name, build, render in (("raw", decode, _render_raw), ("models", parse, _render_models)):
+        t0 = time.perf_counter()
+        build()
+        build_s = time.perf_counter() - t0
+        tracemalloc.start()
+        data = build()
+        heap, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        t0 = time.perf_counter()
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.loads(blob)
+        pickle_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for entry in data:
+            render(*entry)
+        render_s = time.perf_counter() - t0
+        results[name] = {
+            "heap_mb": round(heap / 1e6, 2), "pickle_mb": round(len(blob) / 1e6, 2),
+            "decode_ms": round(build_s * 1000, 1), "pickle_roundtrip_ms": round(pickle_s * 1000, 1),
+            "render_ms": round(render_s * 1000, 1),
+        }
+        del data, blob
+    results["heap_ratio"] = round(results["models"]["heap_mb"] / results["raw"]["heap_mb"], 3)
+    return results
+
+
+def _commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def run_suite(quick=False):
+    secs = 1 if quick else 3
+    rows = 10_000 if quick else 100_000
+    return {
+        "meta": {"commit": _commit(), "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "python": platform.python_version(), "platform": platform.platform(), "quick": quick},
+        "client": bench_client(8, secs, latency_ms=20),
+        "client_throttled": bench_client(8, secs, latency_ms=20, rate_limit=100, retry_after=0.05),
+        "cache": bench_cache(secs),
+        "db": bench_db(4, 2, secs),
+        "export": bench_export(rows, ["csv", "jsonl", "xml"]),
+        "startup": bench_startup(1 if quick else 3),
+        "models": bench_models(500 if quick else 2000),
+    }
+
+
+# Metric name suffix -> True when bigger is better
+_DIRECTION = {"_per_s": True, "_ms": False, "seconds": False, "_mb": False, "errors": False, "retries": False}
+
+
+def _flatten(d, prefix=""):
+    for k, v in d.items():
+        name = f"{prefix}{k}"
+        if isinstance(v, dict):
+            if k not in ("meta", "stub"):
+                yield from _flatten(v, name + ".")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield name, v
+
+
+def compare(base, new, threshold=0.1):
+    """Per-metric change from base to new; `regressed` lists metrics worse by more than threshold."""
+    old = dict(_flatten(base))
+    rows, regressed = [], []
+    for name, value in _flatten(new):
+        if name not in old:
+            continue
+        better_up = next((up for suffix, up in _DIRECTION.items() if name.endswith(suffix)), None)
+        was = old[name]
+        change = (value - was) / was if was else 0.0
+        rows.append({"metric": name, "base": was, "new": value, "change": round(change, 3)})
+        if better_up is not None and (-change if better_up else change) > threshold:
+            regressed.append(name)
+    return {"base": base.get("meta", {}).get("commit"), "new": new.get("meta", {}).get("commit"),
+            "metrics": rows, "regressed": regressed}
+
+
+def main():
+    p = argparse.ArgumentParser(description="weather_app benchmarks")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("db", help="ops/sec for db_ops under concurrent readers and writers")
+    d.add_argument("--readers", type=int, default=4)
+    d.add_argument("--writers", type=int, default=2)
+    d.add_argument("--seconds", type=float, default=3)
+    e = sub.add_parser("export", help="streaming export throughput and peak memory")
+    e.add_argument("--rows", type=int, default=100_000)
+    e.add_argument("--formats", default="csv,jsonl,xml,pdf")
+    c = sub.add_parser("client", help="upstream calls/sec and latency against the local stub")
+    c.add_argument("--threads", type=int, default=8)
+    c.add_argument("--seconds", type=float, default=3)
+    c.add_argument("--keys", type=int, default=50)
+    c.add_argument("--latency-ms", type=float, default=20)
+    c.add_argument("--error-rate", type=float, default=0)
+    c.add_argument("--rate-limit", type=float, default=0, help="stub calls/sec before 429s")
+    h = sub.add_parser("cache", help="cache hit path per backend")
+    h.add_argument("--seconds", type=float, default=3)
+    st_ = sub.add_parser("startup", help="cold import times and the app's first run vs. rerun")
+    st_.add_argument("--runs", type=int, default=3)
+    m = sub.add_parser("models", help="memory and speed of raw payload dicts vs. models.py")
+    m.add_argument("--locations", type=int, default=2000)
+    s = sub.add_parser("suite", help="run every benchmark and save the results as JSON")
+    s.add_argument("--out", help="default: bench_results/<commit>.json")
+    s.add_argument("--quick", action="store_true", help="shorter runs, smaller export")
+    cmp_ = sub.add_parser("compare", help="diff two suite result files")
+    cmp_.add_argument("base")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = p.parse_args()
+
+    if args.cmd == "db":
+        result = bench_db(args.readers, args.writers, args.seconds)
+    elif args.cmd == "export":
+        result = bench_export(args.rows, args.formats.split(","))
+    elif args.cmd == "client":
+        result = bench_client(args.threads, args.seconds, args.keys, latency_ms=args.latency_ms,
+                              error_rate=args.error_rate, rate_limit=args.rate_limit)
+    elif args.cmd == "cache":
+        result = bench_cache(args.seconds)
+    elif args.cmd == "startup":
+        result = bench_startup(args.runs)
+    elif args.cmd == "models":
+        result = bench_models(args.locations)
+    elif args.cmd == "suite":
+        result = run_suite(args.quick)
+        out = args.out or os.path.join("bench_results", f"{result['meta']['commit']}.json")
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"saved {out}", file=sys.stderr)
+    elif args.cmd == "compare":
+        with open(args.base) as fh:
+            base = json.load(fh)
+        with open(args.new) as fh:
+            new = json.load(fh)
+        result = compare(base, new, args.threshold)
+        for m in result["metrics"]:
+            flag = "  REGRESSED" if m["metric"] in result["regressed"] else ""
+            print(f"{m['metric']:<40} {m['base']:>12} {m['new']:>12} {m['change']:>+8.1%}{flag}", file=sys.stderr)
+        print(json.dumps({"regressed": result["regressed"]}, indent=2))
+        sys.exit(1 if result["regressed"] else 0)
+        return
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from db import init_db
+from db_ops import save_requests_bulk, import_checkpoint, clear_import_checkpoint
+
+# Bulk loading of saved requests from CSV or JSONL.
+#
+#   python bulk.py stores.csv --fetch
+#   python bulk.py replica.jsonl --resume
+#
+# CSV columns: location_key, location_label (or label), start_date, end_date,
+# units (default metric) and optionally data_json. JSONL records use the same
+# keys, with the forecast under "data". Records without forecast data get one
+# fetched with --fetch, once per distinct location key in each batch.
+
+BATCH_SIZE = 500
+FETCH_CONCURRENCY = 8
+
+
+class ImportFailed(Exception):
+    # position: records committed before the failure, i.e. where --resume picks up
+    def __init__(self, message: str, position: Optional[int] = None):
+        super().__init__(message)
+        self.position = position
+
+
+def _normalise(rec: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(rec, dict):
+        raise TypeError(f"expected an object, got {type(rec).__name__}")
+    # csv.DictReader fills short rows with None
+    for field in ("start_date", "end_date"):
+        if rec.get(field) in (None, ""):
+            raise KeyError(field)
+    data = rec.get("data")
+    if data is None and rec.get("data_json"):
+        data = json.loads(rec["data_json"])
+    key = str(rec.get("location_key") or "").strip()
+    if not key:
+        raise ValueError("missing location_key")
+    return {
+        "location_key": key,
+        "label": rec.get("location_label") or rec.get("label") or key,
+        "start": str(rec["start_date"]),
+        "end": str(rec["end_date"]),
+        "units": rec.get("units") or "metric",
+        "data": data,
+    }
+
+
+def _describe(e: Exception) -> str:
+    return f"missing {e.args[0]}" if isinstance(e, KeyError) else str(e)
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    # Streams records from the file; nothing is held beyond the current line.
+    # A malformed record raises ImportFailed naming its record number and line.
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, newline="", encoding="utf-8") as fh:
+        if fmt == "csv":
+            reader = csv.DictReader(fh)
+            rows = ((reader.line_num, rec) for rec in reader)
+        else:
+            rows = ((line_no, line) for line_no, line in enumerate(fh, 1) if line.strip())
+        for n, (line_no, rec) in enumerate(rows, 1):
+            try:
+                rec = _normalise(rec if fmt == "csv" else json.loads(rec))
+            except (KeyError, ValueError, TypeError) as e:
+                raise ImportFailed(f"record {n} (line {line_no}): {_describe(e)}") from e
+            yield rec
+
+
+def _fill_forecasts(batch: List[Dict[str, Any]], concurrency: int, skip_failed: bool) -> Tuple[int, int]:
+    from accuweather_async import get_forecasts
+
+    need = [r for r in batch if r["data"] is None]
+    fetched = failed = 0
+    for metric in (True, False):
+        group = [r for r in need if (r["units"] == "metric") == metric]
+        if not group:
+            continue
+        keys = {r["location_key"] for r in group}
+        results = get_forecasts(keys, metric=metric, concurrency=concurrency, return_exceptions=True)
+        fetched += len(keys)
+        for r in group:
+            res = results[r["location_key"]]
+            if isinstance(res, Exception):
+                if not skip_failed:
+                    raise ImportFailed(f"forecast for {r['location_key']} failed: {res}")
+                failed += 1
+            else:
+                r["data"] = res
+    return fetched, failed
+
+
+def import_file(path: str, fmt: Optional[str] = None, batch_size: int = BATCH_SIZE,
+                fetch: bool = False, concurrency: int = FETCH_CONCURRENCY,
+                resume: bool = False, skip_failed: bool = False,
+                progress=None) -> Dict[str, Any]:
+    """Import requests from path in batched transactions.
+
+    Each committed batch advances a checkpoint keyed by the file's absolute
+    path; with resume=True records before it are skipped. Without resume the
+    checkpoint is reset and the whole file is imported again.
+    """
+    init_db()
+    source = os.path.abspath(path)
+    start_at = import_checkpoint(source) if resume else 0
+    if not resume:
+        clear_import_checkpoint(source)
+
+    stats = {"source": source, "skipped": start_at, "imported": 0, "batches": 0,
+             "fetched": 0, "fetch_failed": 0, "seconds": 0.0}
+    t0 = time.perf_counter()
+    position = start_at
+    records = islice(read_records(path, fmt), start_at, None)
+    while True:
+        try:
+            batch = list(islice(records, batch_size))
+            if batch and fetch:
+                fetched, failed = _fill_forecasts(batch, concurrency, skip_failed)
+                stats["fetched"] += fetched
+                stats["fetch_failed"] += failed
+        except ImportFailed as e:
+            # Nothing of this batch is committed; the checkpoint stays at `position`
+            raise ImportFailed(str(e), position) from e
+        if not batch:
+            break
+        position += len(batch)
+        rows = [(r["location_key"], r["label"], r["start"], r["end"], r["units"], r["data"] or {}) for r in batch]
+        stats["imported"] += save_requests_bulk(rows, checkpoint=(source, position))
+        stats["batches"] += 1
+        if progress:
+            progress(stats)
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    stats["per_second"] = round(stats["imported"] / stats["seconds"], 1) if stats["seconds"] else None
+    return stats
+
+
+def main():
+    p = argparse.ArgumentParser(description="Bulk-import saved weather requests from CSV/JSONL")
+    p.add_argument("path")
+    p.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    p.add_argument("--batch", type=int, default=BATCH_SIZE, help="records per transaction")
+    p.add_argument("--fetch", action="store_true", help="fetch forecasts for records without data")
+    p.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY)
+    p.add_argument("--resume", action="store_true", help="continue after the last committed batch")
+    p.add_argument("--skip-failed", action="store_true", help="save records whose fetch failed without forecast data")
+    args = p.parse_args()
+
+    def progress(s):
+        print(f"\r{s['skipped'] + s['imported']} records, {s['batches']} batches", end="", file=sys.stderr)
+
+    try:
+        stats = import_file(args.path, args.format, args.batch, args.fetch, args.concurrency,
+                            args.resume, args.skip_failed, progress)
+    except ImportFailed as e:
+        print(f"\nImport stopped: {e}\n{e.position} record(s) committed. "
+              "Fix the record and re-run with --resume to continue.", file=sys.stderr)
+        sys.exit(1)
+    print(file=sys.stderr)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+import db
+
+# Response cache for accuweather_client. SQLite backend is shared by every
+# process/replica pointed at the same file, and survives restarts.
+
+CACHE_FILE = os.getenv("ACCU_CACHE_FILE", "accuweather_cache.db")
+MAX_ENTRIES = int(os.getenv("ACCU_CACHE_MAX_ENTRIES", "5000"))
+MAX_BYTES = int(os.getenv("ACCU_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# endpoint -> (fresh seconds, extra seconds an entry may be served stale while it revalidates)
+TTLS: Dict[str, Tuple[int, int]] = {
+    "search": (7 * 24 * 3600, 7 * 24 * 3600),
+    "current": (300, 900),
+    "forecast": (1800, 6 * 3600),
+    "default": (300, 300),
+}
+
+FRESH, STALE = "fresh", "stale"
+
+
+def ttl_for(endpoint: str) -> Tuple[int, int]:
+    return TTLS.get(endpoint, TTLS["default"])
+
+
+def make_key(endpoint: str, url: str, params: Dict[str, Any]) -> str:
+    # apikey is deliberately excluded so replicas with different keys share entries
+    items = sorted((k, str(v)) for k, v in params.items() if k != "apikey")
+    return f"{endpoint}|{url}|" + "&".join(f"{k}={v}" for k, v in items)
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._c = {"hits": 0, "stale_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self._c[name] += n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._c)
+
+
+class MemoryCache:
+    """Per-process LRU; handy for tests and single-replica setups."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+
+    def get(self, key: str, allow_expired: bool = False) -> Tuple[Any, Optional[str]]:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats.incr("misses")
+                return None, None
+            value, fresh_until, stale_until = entry
+            if now > stale_until and not allow_expired:
+                self._stats.incr("misses")
+                return None, None
+            self._data.move_to_end(key)
+        if now <= fresh_until:
+            self._stats.incr("hits")
+            return value, FRESH
+        self._stats.incr("stale_hits")
+        return value, STALE
+
+    def set(self, endpoint: str, key: str, value: Any):
+        fresh, stale = ttl_for(endpoint)
+        now = time.time()
+        with self._lock:
+            self._data[key] = (value, now + fresh, now + fresh + stale)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+        self._stats.incr("sets")
+        if evicted:
+            self._stats.incr("evictions", evicted)
+
+    def expires_in(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._data.get(key)
+        return None if entry is None else entry[1] - time.time()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        s = self._stats.snapshot()
+        with self._lock:
+            s["entries"] = len(self._data)
+        return s
+
+
+class SQLiteCache:
+    """Size-bounded LRU stored in a SQLite file (WAL, so readers don't block writers)."""
+
+    # Only bump last_access when it is older than this, to keep hits mostly read-only
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path: str = CACHE_FILE, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._stats = _Stats()
+        self._init()
+
+    def _conn(self) -> sqlite3.Connection:
+        return db.get_conn(self.path)
+
+    def _init(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_http_cache_last_access ON http_cache(last_access)")
+
+    def get(self, key: str, allow_expired: bool = False) -> Tuple[Any, Optional[str]]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT body, fresh_until, stale_until, last_access FROM http_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (now > row[2] and not allow_expired):
+            self._stats.incr("misses")
+            return None, None
+        body, fresh_until, _, last_access = row
+        if now - last_access > self.TOUCH_INTERVAL:
+            conn.execute("UPDATE http_cache SET last_access = ? WHERE key = ?", (now, key))
+        if now <= fresh_until:
+            self._stats.incr("hits")
+            return json.loads(body), FRESH
+        self._stats.incr("stale_hits")
+        return json.loads(body), STALE
+
+    def set(self, endpoint: str, key: str, value: Any):
+        fresh, stale = ttl_for(endpoint)
+        now = time.time()
+        body = json.dumps(value, separators=(",", ":"))
+        conn = self._conn()
+        conn.execute("""
+            INSERT OR REPLACE INTO http_cache (key, endpoint, body, size, fresh_until, stale_until, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (key, endpoint, body, len(body), now + fresh, now + fresh + stale, now))
+        self._stats.incr("sets")
+        self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Drop least recently used rows until both bounds hold
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM http_cache ORDER BY last_access"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        with db.transaction(self.path) as tx:
+            tx.executemany("DELETE FROM http_cache WHERE key = ?", victims)
+        self._stats.incr("evictions", len(victims))
+
+    def expires_in(self, key: str) -> Optional[float]:
+        row = self._conn().execute("SELECT fresh_until FROM http_cache WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0] - time.time()
+
+    def clear(self):
+        self._conn().execute("DELETE FROM http_cache")
+
+    def stats(self) -> Dict[str, int]:
+        s = self._stats.snapshot()
+        s["entries"], s["bytes"] = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache"
+        ).fetchone()
+        return s
+
+
+class NullCache:
+    def get(self, key: str, allow_expired: bool = False):
+        return None, None
+
+    def set(self, endpoint: str, key: str, value: Any):
+        pass
+
+    def expires_in(self, key: str):
+        return None
+
+    def clear(self):
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    # Backend picked by ACCU_CACHE=sqlite|memory|none (default sqlite)
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                kind = os.getenv("ACCU_CACHE", "sqlite").lower()
+                if kind == "memory":
+                    _cache = MemoryCache()
+                elif kind == "none":
+                    _cache = NullCache()
+                else:
+                    _cache = SQLiteCache()
+    return _cache
+
+
+def set_cache(backend):
+    global _cache
+    _cache = backend
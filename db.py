@@ -1,10 +1,94 @@
+import json
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 
-DB_FILE = "weather.db"
+import metrics
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
+DB_FILE = os.getenv("WEATHER_DB", "weather.db")
+
+# Connections are kept open per thread (and per file) instead of one per call.
+# WAL lets readers run alongside a writer; busy_timeout makes writers queue
+# instead of failing with "database is locked".
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                           cached_statements=CACHED_STATEMENTS)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def get_conn(path=None):
+    # Autocommit connection owned by the calling thread; use transaction() for writes
+    path = path or DB_FILE
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+    return conn
+
+def close_conn(path=None):
+    conns = getattr(_local, "conns", {})
+    conn = conns.pop(path or DB_FILE, None)
+    if conn is not None:
+        conn.close()
+
+@contextmanager
+def transaction(path=None):
+    # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers wait
+    # on busy_timeout instead of deadlocking on a read->write upgrade
+    conn = get_conn(path)
+    t0 = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    metrics.observe("db_lock_wait", time.perf_counter() - t0)
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def init_db(force=False):
+    # Schema setup runs once per process per database file
+    if DB_FILE in _initialized and not force:
+        return
+    with _init_lock:
+        if DB_FILE in _initialized and not force:
+            return
+        with transaction() as conn:
+            cur = conn.cursor()
+            version = cur.execute("PRAGMA user_version").fetchone()[0]
+            if _has_column(cur, "weather_requests", "data_json"):
+                _migrate_blob_requests(cur)
+            else:
+                _create_schema(cur)
+                if 2 <= version < 3:
+                    _seed_v3(cur)
+            cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        _initialized.add(DB_FILE)
+
+# 2: forecasts normalised into daily_forecasts + content-addressed forecast_payloads
+# 3: per-request snapshots in request_days, forecast history in forecast_revisions
+SCHEMA_VERSION = 3
+
+def _has_column(cur, table, column):
+    return any(r[1] == column for r in cur.execute(f"PRAGMA table_info({table})"))
+
+def _create_schema(cur):
+    # A saved request points at a location/units and the window of days it
+    # covers (days_from..days_to); the days themselves live in daily_forecasts
     cur.execute("""
         CREATE TABLE IF NOT EXISTS weather_requests (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -13,11 +97,233 @@ def init_db():
             start_date TEXT NOT NULL,
             end_date TEXT NOT NULL,
             units TEXT NOT NULL,
-            data_json TEXT NOT NULL
+            headline_hash TEXT,
+            days_from TEXT,
+            days_to TEXT
+        )
+    """)
+    # Raw JSON fragments stored once, keyed by sha256 of their canonical form
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_payloads (
+            hash TEXT PRIMARY KEY,
+            body TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    # Latest known forecast per location/day/units; queried by date range
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS daily_forecasts (
+            location_key TEXT NOT NULL,
+            units TEXT NOT NULL,
+            date TEXT NOT NULL,
+            epoch_date INTEGER,
+            min_temp REAL,
+            max_temp REAL,
+            temp_unit TEXT,
+            day_icon INTEGER,
+            day_phrase TEXT,
+            day_has_precip INTEGER,
+            night_icon INTEGER,
+            night_phrase TEXT,
+            night_has_precip INTEGER,
+            payload_hash TEXT NOT NULL,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (location_key, units, date)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_daily_forecasts_date ON daily_forecasts(date)")
+    # The days each saved request was saved (or last refreshed) with; the
+    # payloads are shared, so a snapshot costs one row per day
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS request_days (
+            request_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            payload_hash TEXT NOT NULL,
+            PRIMARY KEY (request_id, date)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_request_days_hash ON request_days(payload_hash)")
+    # Every version a day's forecast has had, for drift analytics. Filled by
+    # triggers, so it covers single saves, bulk imports and migrations alike;
+    # gc_payloads prunes it by age.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_revisions (
+            location_key TEXT NOT NULL,
+            units TEXT NOT NULL,
+            date TEXT NOT NULL,
+            recorded_at INTEGER NOT NULL,
+            min_temp REAL,
+            max_temp REAL,
+            payload_hash TEXT NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_forecast_revisions_key ON forecast_revisions(location_key, units, date, recorded_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_forecast_revisions_time ON forecast_revisions(recorded_at)")
+    for event in ("INSERT", "UPDATE OF payload_hash"):
+        name = "trg_daily_revision_" + event.split()[0].lower()
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON daily_forecasts
+            BEGIN
+                INSERT INTO forecast_revisions (location_key, units, date, recorded_at, min_temp, max_temp, payload_hash)
+                VALUES (NEW.location_key, NEW.units, NEW.date, NEW.updated_at, NEW.min_temp, NEW.max_temp, NEW.payload_hash);
+            END
+        """)
+    # Resume points for bulk.py imports: records consumed from each source
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_imports (
+            source TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+    # One row per refresh run (refresh.py); per-day changes land in forecast_revisions
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_refreshes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at INTEGER NOT NULL,
+            finished_at INTEGER NOT NULL,
+            requests INTEGER NOT NULL,
+            locations INTEGER NOT NULL,
+            failed INTEGER NOT NULL,
+            days_added INTEGER NOT NULL,
+            days_changed INTEGER NOT NULL,
+            days_unchanged INTEGER NOT NULL
+        )
+    """)
+    # One row per location view; feeds the forecast pre-warmer
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS location_access (
+            location_key TEXT NOT NULL,
+            accessed_at INTEGER NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_location_access_time ON location_access(accessed_at, location_key)")
+    # Locations on the Watchlist dashboard, in display order; also kept warm by the pre-warmer
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS watchlist (
+            location_key TEXT PRIMARY KEY,
+            label TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            added_at INTEGER NOT NULL
+        )
+    """)
+    # Archived current conditions (archive.py): appended in batches, deduplicated on key+time
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS observations (
+            location_key TEXT NOT NULL,
+            observed_at INTEGER NOT NULL,
+            temp_c REAL,
+            realfeel_c REAL,
+            humidity INTEGER,
+            wind_kmh REAL,
+            icon INTEGER,
+            text TEXT,
+            recorded_at INTEGER NOT NULL
+        )
+    """)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_observations_key_time ON observations(location_key, observed_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_observations_time ON observations(observed_at)")
+    # Hourly and daily rollups keep counts and sums so coarser buckets merge exactly
+    for table in ("observations_hourly", "observations_daily"):
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                location_key TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                n INTEGER NOT NULL,
+                temp_n INTEGER NOT NULL,
+                temp_min REAL,
+                temp_max REAL,
+                temp_sum REAL,
+                humidity_n INTEGER NOT NULL,
+                humidity_sum REAL,
+                wind_max REAL,
+                PRIMARY KEY (location_key, bucket)
+            ) WITHOUT ROWID
+        """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_observations_hourly_bucket ON observations_hourly(bucket)")
+    # Per rollup level: everything before `until` has been folded in
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            until INTEGER NOT NULL
+        )
+    """)
+    # Listing/filter indexes for the Saved Requests tab (keyset pagination on id)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_key_id ON weather_requests(location_key, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_label_id ON weather_requests(lower(location_label), id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_start ON weather_requests(start_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_end ON weather_requests(end_date)")
+    # Row count kept by triggers so the unfiltered total never scans the table
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS request_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL
         )
     """)
-    conn.commit()
-    conn.close()
+    cur.execute("INSERT OR IGNORE INTO request_stats (id, total) SELECT 1, COUNT(*) FROM weather_requests")
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_requests_count_ins AFTER INSERT ON weather_requests
+        BEGIN UPDATE request_stats SET total = total + 1 WHERE id = 1; END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_requests_count_del AFTER DELETE ON weather_requests
+        BEGIN UPDATE request_stats SET total = total - 1 WHERE id = 1; END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_requests_days_del AFTER DELETE ON weather_requests
+        BEGIN DELETE FROM request_days WHERE request_id = OLD.id; END
+    """)
+
+def _seed_v3(cur):
+    """Fill the v3 tables from a v2 database's daily_forecasts; runs once, on upgrade.
+
+    v2 requests read the shared days, so those are their snapshot and the
+    first revision of each day.
+    """
+    cur.execute("""
+        INSERT OR IGNORE INTO request_days (request_id, date, payload_hash)
+        SELECT r.id, d.date, d.payload_hash FROM weather_requests r
+        JOIN daily_forecasts d
+          ON d.location_key = r.location_key AND d.units = r.units AND d.date BETWEEN r.days_from AND r.days_to
+    """)
+    cur.execute("""
+        INSERT INTO forecast_revisions (location_key, units, date, recorded_at, min_temp, max_temp, payload_hash)
+        SELECT location_key, units, date, updated_at, min_temp, max_temp, payload_hash FROM daily_forecasts
+    """)
+
+def _migrate_blob_requests(cur):
+    """Move pre-v2 weather_requests (one data_json blob per row) onto daily_forecasts.
+
+    Rows are replayed oldest first so the newest save of a location/day wins,
+    matching what save_request does going forward.
+    """
+    from db_ops import _store_forecast
+
+    # Indexes and triggers would follow the renamed table; drop them so
+    # _create_schema recreates them on the new one
+    for (name,) in cur.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'weather_requests'").fetchall():
+        cur.execute(f"DROP TRIGGER {name}")
+    for (name,) in cur.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'weather_requests' AND sql IS NOT NULL").fetchall():
+        cur.execute(f"DROP INDEX {name}")
+    cur.execute("ALTER TABLE weather_requests RENAME TO weather_requests_v1")
+    _create_schema(cur)
 
-def get_conn():
-    return sqlite3.connect(DB_FILE)
\ No newline at end of file
+    old = cur.execute(
+        "SELECT id, location_key, location_label, start_date, end_date, units, data_json FROM weather_requests_v1 ORDER BY id"
+    ).fetchall()
+    for rid, key, label, start, end, units, data_json in old:
+        try:
+            data = json.loads(data_json) if data_json else {}
+        except ValueError:
+            data = {}
+        headline_hash, days_from, days_to, days = _store_forecast(cur, key, units, data)
+        cur.execute("""
+            INSERT INTO weather_requests (id, location_key, location_label, start_date, end_date, units, headline_hash, days_from, days_to)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (rid, key, label, start, end, units, headline_hash, days_from, days_to))
+        cur.executemany("INSERT OR REPLACE INTO request_days (request_id, date, payload_hash) VALUES (?, ?, ?)",
+                        [(rid, d, h) for d, h in days])
+    # Keep AUTOINCREMENT from reusing ids of rows deleted before the migration
+    cur.execute("DELETE FROM sqlite_sequence WHERE name = 'weather_requests'")
+    cur.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'weather_requests', seq FROM sqlite_sequence WHERE name = 'weather_requests_v1'")
+    cur.execute("DROP TABLE weather_requests_v1")
+    cur.execute("UPDATE request_stats SET total = (SELECT COUNT(*) FROM weather_requests) WHERE id = 1")
@@ -1,51 +1,553 @@
+import hashlib
 import json
-from db import get_conn
+import time
+from db import get_conn, transaction
+from metrics import instrument, timed
+
+# Forecast storage: each day of a forecast_5day response becomes one
+# daily_forecasts row (location/units/date), and the raw JSON of every day
+# and of the Headline envelope is stored once in forecast_payloads, keyed by
+# the sha256 of its canonical form, so identical forecasts are not duplicated.
+# daily_forecasts only holds the latest version of a day; each saved request
+# keeps its own snapshot as request_days (date -> payload hash), so a later
+# save or refresh of the same location never rewrites an older request.
+
+def _canonical(obj):
+    with timed("json", op="dumps_forecast"):
+        return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+def _payload(obj):
+    body = _canonical(obj)
+    return hashlib.sha256(body.encode()).hexdigest(), body
+
+def _day_row(location_key, units, d, payload_hash, now):
+    temp = d.get("Temperature", {})
+    day = d.get("Day", {})
+    night = d.get("Night", {})
+    return (
+        location_key, units, d["Date"][:10], d.get("EpochDate"),
+        temp.get("Minimum", {}).get("Value"), temp.get("Maximum", {}).get("Value"),
+        temp.get("Minimum", {}).get("Unit"),
+        day.get("Icon"), day.get("IconPhrase"), day.get("HasPrecipitation"),
+        night.get("Icon"), night.get("IconPhrase"), night.get("HasPrecipitation"),
+        payload_hash, now,
+    )
+
+_UPSERT_DAY = """
+    INSERT INTO daily_forecasts (
+        location_key, units, date, epoch_date, min_temp, max_temp, temp_unit,
+        day_icon, day_phrase, day_has_precip, night_icon, night_phrase, night_has_precip,
+        payload_hash, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (location_key, units, date) DO UPDATE SET
+        epoch_date = excluded.epoch_date, min_temp = excluded.min_temp, max_temp = excluded.max_temp,
+        temp_unit = excluded.temp_unit, day_icon = excluded.day_icon, day_phrase = excluded.day_phrase,
+        day_has_precip = excluded.day_has_precip, night_icon = excluded.night_icon,
+        night_phrase = excluded.night_phrase, night_has_precip = excluded.night_has_precip,
+        payload_hash = excluded.payload_hash, updated_at = excluded.updated_at
+    WHERE daily_forecasts.payload_hash != excluded.payload_hash
+"""
+
+_INSERT_PAYLOAD = "INSERT OR IGNORE INTO forecast_payloads (hash, body) VALUES (?, ?)"
+
+_INSERT_REQUEST_DAY = "INSERT OR REPLACE INTO request_days (request_id, date, payload_hash) VALUES (?, ?, ?)"
+
+_INSERT_REQUEST = """
+    INSERT INTO weather_requests (location_key, location_label, start_date, end_date, units, headline_hash, days_from, days_to)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _forecast_rows(location_key, units, data, now):
+    # Split a forecast_5day response into (payloads, day rows, headline_hash, days_from, days_to)
+    if not isinstance(data, dict):
+        return [], [], None, None, None
+    payloads, rows = [], []
+    envelope = {k: v for k, v in data.items() if k != "DailyForecasts"}
+    headline_hash = None
+    if envelope:
+        headline_hash, body = _payload(envelope)
+        payloads.append((headline_hash, body))
+    for d in data.get("DailyForecasts", []):
+        if not (isinstance(d, dict) and isinstance(d.get("Date"), str)):
+            continue
+        digest, body = _payload(d)
+        payloads.append((digest, body))
+        rows.append(_day_row(location_key, units, d, digest, now))
+    dates = [r[2] for r in rows]
+    return payloads, rows, headline_hash, (min(dates) if dates else None), (max(dates) if dates else None)
+
+def _store_forecast(cur, location_key, units, data):
+    # Upsert the days of a forecast_5day response; returns (headline_hash, days_from, days_to, [(date, hash)])
+    payloads, rows, headline_hash, days_from, days_to = _forecast_rows(location_key, units, data, int(time.time()))
+    cur.executemany(_INSERT_PAYLOAD, payloads)
+    cur.executemany(_UPSERT_DAY, rows)
+    return headline_hash, days_from, days_to, [(r[2], r[13]) for r in rows]
 
 # CREATE
+@instrument("db_op")
 def save_request(location_key, label, start, end, units, data):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO weather_requests (location_key, location_label, start_date, end_date, units, data_json)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (location_key, label, start, end, units, json.dumps(data)))
-    rid = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return rid
+    with transaction() as conn:
+        headline_hash, days_from, days_to, days = _store_forecast(conn, location_key, units, data)
+        cur = conn.execute(_INSERT_REQUEST, (location_key, label, start, end, units, headline_hash, days_from, days_to))
+        conn.executemany(_INSERT_REQUEST_DAY, [(cur.lastrowid, d, h) for d, h in days])
+        return cur.lastrowid
+
+@instrument("db_op")
+def save_requests_bulk(records, checkpoint=None):
+    """Insert many requests in a single transaction using executemany.
+
+    records are (location_key, label, start, end, units, data) tuples.
+    checkpoint=(source, position) is recorded in bulk_imports in the same
+    transaction, so an interrupted import can resume after the last batch
+    that actually committed. Returns the number of requests inserted.
+    """
+    now = int(time.time())
+    payloads, day_rows, request_rows, request_days = [], [], [], []
+    for location_key, label, start, end, units, data in records:
+        p, rows, headline_hash, days_from, days_to = _forecast_rows(location_key, units, data, now)
+        payloads += p
+        day_rows += rows
+        request_rows.append((location_key, label, start, end, units, headline_hash, days_from, days_to))
+        request_days.append([(r[2], r[13]) for r in rows])
+    with transaction() as conn:
+        conn.executemany(_INSERT_PAYLOAD, payloads)
+        conn.executemany(_UPSERT_DAY, day_rows)
+        conn.executemany(_INSERT_REQUEST, request_rows)
+        # The write lock is held, so the batch got consecutive ids ending at last_insert_rowid()
+        first_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(request_rows) + 1
+        conn.executemany(_INSERT_REQUEST_DAY, [
+            (first_id + i, d, h) for i, days in enumerate(request_days) for d, h in days
+        ])
+        if checkpoint is not None:
+            conn.execute("""
+                INSERT INTO bulk_imports (source, position, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (source) DO UPDATE SET position = excluded.position, updated_at = excluded.updated_at
+            """, (checkpoint[0], checkpoint[1], now))
+    return len(request_rows)
+
+@instrument("db_op")
+def import_checkpoint(source):
+    row = get_conn().execute("SELECT position FROM bulk_imports WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else 0
+
+@instrument("db_op")
+def clear_import_checkpoint(source):
+    with transaction() as conn:
+        conn.execute("DELETE FROM bulk_imports WHERE source = ?", (source,))
 
 # READ
+@instrument("db_op")
 def list_requests():
+    return get_conn().execute(
+        "SELECT id, location_label, start_date, end_date, units FROM weather_requests ORDER BY id DESC"
+    ).fetchall()
+
+def _request_filters(label=None, location_key=None, date_from=None, date_to=None, alias=""):
+    # WHERE fragments that each map onto one of the listing indexes
+    t = f"{alias}." if alias else ""
+    where, params = [], []
+    if label:
+        prefix = label.strip().lower()
+        where.append(f"lower({t}location_label) >= ? AND lower({t}location_label) < ?")
+        params += [prefix, prefix + "\uffff"]
+    if location_key:
+        where.append(f"{t}location_key = ?")
+        params.append(location_key)
+    if date_from:
+        where.append(f"{t}end_date >= ?")
+        params.append(str(date_from))
+    if date_to:
+        where.append(f"{t}start_date <= ?")
+        params.append(str(date_to))
+    return where, params
+
+@instrument("db_op")
+def list_requests_page(limit=25, before_id=None, label=None, location_key=None, date_from=None, date_to=None):
+    """One page of saved requests, newest first, using keyset pagination on id.
+
+    label matches as a case-insensitive prefix; date_from/date_to keep requests
+    whose range overlaps the window. Returns (rows, next_before_id); the cursor
+    is None on the last page.
+    """
+    where, params = _request_filters(label, location_key, date_from, date_to)
+    if before_id is not None:
+        where.append("id < ?")
+        params.append(before_id)
+    sql = "SELECT id, location_label, start_date, end_date, units FROM weather_requests"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    rows = get_conn().execute(sql, params + [limit + 1]).fetchall()
+    next_before = rows[limit - 1][0] if len(rows) > limit else None
+    return rows[:limit], next_before
+
+@instrument("db_op")
+def count_requests(label=None, location_key=None, date_from=None, date_to=None):
+    where, params = _request_filters(label, location_key, date_from, date_to)
+    conn = get_conn()
+    if not where:
+        row = conn.execute("SELECT total FROM request_stats WHERE id = 1").fetchone()
+        return row[0] if row else 0
+    return conn.execute("SELECT COUNT(*) FROM weather_requests WHERE " + " AND ".join(where), params).fetchone()[0]
+
+@instrument("db_op")
+def get_request_days(req_id, start=None, end=None):
+    # Day dicts of a saved request, optionally narrowed to start..end (indexed range query)
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, location_label, start_date, end_date, units FROM weather_requests ORDER BY id DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    row = conn.execute("SELECT location_key, units, days_from, days_to FROM weather_requests WHERE id = ?", (req_id,)).fetchone()
+    if not row or row[2] is None:
+        return []
+    key, units, lo, hi = row
+    if start is not None:
+        lo = max(lo, str(start))
+    if end is not None:
+        hi = min(hi, str(end))
+    rows = conn.execute("""
+        SELECT p.body FROM request_days d JOIN forecast_payloads p ON p.hash = d.payload_hash
+        WHERE d.request_id = ? AND d.date BETWEEN ? AND ?
+        ORDER BY d.date
+    """, (req_id, lo, hi)).fetchall()
+    with timed("json", op="loads_forecast"):
+        return [json.loads(r[0]) for r in rows]
 
+@instrument("db_op")
 def get_requests(req_id):
+    # (id, location_key, label, start_date, end_date, units, forecast dict)
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, location_key, location_label, start_date, end_date, units, data_json FROM weather_requests WHERE id = ?", (req_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    row = conn.execute("""
+        SELECT r.id, r.location_key, r.location_label, r.start_date, r.end_date, r.units, p.body
+        FROM weather_requests r LEFT JOIN forecast_payloads p ON p.hash = r.headline_hash
+        WHERE r.id = ?
+    """, (req_id,)).fetchone()
+    if not row:
+        return None
+    with timed("json", op="loads_forecast"):
+        data = json.loads(row[6]) if row[6] else {}
+    data["DailyForecasts"] = get_request_days(req_id)
+    return row[:6] + (data,)
+
+EXPORT_COLUMNS = ["request_id", "location", "date", "min", "max", "day", "night"]
+
+@instrument("db_op")
+def iter_export_rows(request_ids=None, label=None, location_key=None, date_from=None, date_to=None,
+                     fetch_size=1000):
+    """Yield one tuple per saved request per day (see EXPORT_COLUMNS), newest request first.
+
+    Rows stream straight from a cursor in fetch_size chunks, so memory does
+    not grow with the size of the export. Filters match list_requests_page;
+    request_ids restricts the export to specific requests. date_from/date_to
+    also clip each request's days to the range (a range scan on request_days).
+    """
+    where, params = _request_filters(label, location_key, date_from, date_to, alias="r")
+    # The day bounds sit in the join, ahead of the WHERE placeholders
+    lo = str(date_from) if date_from else ""
+    hi = str(date_to) if date_to else "\uffff"
+    if request_ids is not None:
+        ids = [int(i) for i in request_ids]
+        if not ids:
+            return
+        where.append(f"r.id IN ({','.join('?' * len(ids))})")
+        params += ids
+    sql = """
+        SELECT r.id, r.location_label, d.date,
+            json_extract(p.body, '$.Temperature.Minimum.Value'), json_extract(p.body, '$.Temperature.Maximum.Value'),
+            json_extract(p.body, '$.Day.IconPhrase'), json_extract(p.body, '$.Night.IconPhrase')
+        FROM weather_requests r
+        JOIN request_days d ON d.request_id = r.id AND d.date BETWEEN r.days_from AND r.days_to
+            AND d.date BETWEEN ? AND ?
+        JOIN forecast_payloads p ON p.hash = d.payload_hash
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY r.id DESC, d.date"
+    cur = get_conn().execute(sql, [lo, hi] + params)
+    try:
+        while True:
+            chunk = cur.fetchmany(fetch_size)
+            if not chunk:
+                break
+            yield from chunk
+    finally:
+        cur.close()
 
 # UPDATE
-def update_request(req_id, start, end, new_data):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE weather_requests SET start_date = ?, end_date = ?, data_json = ?
-        WHERE id = ?
-    """, (start, end, json.dumps(new_data), req_id))
-    conn.commit()
-    conn.close()
+@instrument("db_op")
+def update_request(req_id, start, end, new_data=None):
+    """Change a request's dates.
+
+    Without new_data the request's days are narrowed to start..end in place;
+    with new_data (a forecast_5day response) its days are stored and replace
+    the request's window.
+    """
+    with transaction() as conn:
+        if new_data is None:
+            conn.execute("""
+                UPDATE weather_requests SET start_date = ?, end_date = ?,
+                    days_from = MAX(days_from, ?), days_to = MIN(days_to, ?)
+                WHERE id = ?
+            """, (start, end, str(start), str(end), req_id))
+            return
+        row = conn.execute("SELECT location_key, units FROM weather_requests WHERE id = ?", (req_id,)).fetchone()
+        if not row:
+            return
+        headline_hash, days_from, days_to, days = _store_forecast(conn, row[0], row[1], new_data)
+        conn.execute("""
+            UPDATE weather_requests SET start_date = ?, end_date = ?,
+                headline_hash = COALESCE(?, headline_hash), days_from = ?, days_to = ?
+            WHERE id = ?
+        """, (start, end, headline_hash, days_from, days_to, req_id))
+        conn.execute("DELETE FROM request_days WHERE request_id = ?", (req_id,))
+        conn.executemany(_INSERT_REQUEST_DAY, [(req_id, d, h) for d, h in days])
 
 # DELETE
+@instrument("db_op")
 def delete_request(req_id):
+    # Returns whether a request was deleted
+    with transaction() as conn:
+        return conn.execute("DELETE FROM weather_requests WHERE id = ?", (req_id,)).rowcount > 0
+
+# REFRESH
+@instrument("db_op")
+def refresh_targets(request_ids=None, label=None, location_key=None, date_from=None, date_to=None):
+    """Distinct (location_key, units, [request ids]) across the selected requests."""
+    where, params = _request_filters(label, location_key, date_from, date_to)
+    if request_ids is not None:
+        ids = [int(i) for i in request_ids]
+        if not ids:
+            return []
+        where.append(f"id IN ({','.join('?' * len(ids))})")
+        params += ids
+    sql = "SELECT location_key, units, GROUP_CONCAT(id) FROM weather_requests"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " GROUP BY location_key, units"
+    return [(key, units, [int(i) for i in ids.split(",")]) for key, units, ids in get_conn().execute(sql, params)]
+
+@instrument("db_op")
+def merge_forecast(location_key, units, data, request_ids=()):
+    """Merge a fresh forecast_5day response into the stored days of one location.
+
+    Days are matched on date; only new days and days whose payload changed
+    (temperatures, phrases, EpochDate...) are written, and the revision
+    triggers record each write. The snapshots of request_ids (requests for
+    this location/units) are moved onto the fresh days within their window,
+    and onto its headline. Returns the per-day changes as dicts with date,
+    kind ("added"/"changed"), epoch_date and before/after min/max.
+    """
+    payloads, rows, headline_hash, _, _ = _forecast_rows(location_key, units, data, int(time.time()))
+    if not rows:
+        return []
+    with transaction() as conn:
+        dates = [r[2] for r in rows]
+        stored = {
+            r[0]: r[1:] for r in conn.execute(f"""
+                SELECT date, payload_hash, epoch_date, min_temp, max_temp FROM daily_forecasts
+                WHERE location_key = ? AND units = ? AND date IN ({','.join('?' * len(dates))})
+            """, [location_key, units] + dates)
+        }
+        changed, changes = [], []
+        for r in rows:
+            old = stored.get(r[2])
+            if old is not None and old[0] == r[13]:
+                continue
+            changed.append(r)
+            changes.append({
+                "date": r[2], "kind": "changed" if old else "added", "epoch_date": r[3],
+                "min_before": old[2] if old else None, "max_before": old[3] if old else None,
+                "min_after": r[4], "max_after": r[5],
+            })
+        if changed:
+            wanted = {r[13] for r in changed}
+            conn.executemany(_INSERT_PAYLOAD, [p for p in payloads if p[0] in wanted])
+            conn.executemany(_UPSERT_DAY, changed)
+        if request_ids:
+            if headline_hash:
+                conn.executemany(_INSERT_PAYLOAD, [p for p in payloads if p[0] == headline_hash])
+            conn.executemany("UPDATE weather_requests SET headline_hash = COALESCE(?, headline_hash) WHERE id = ?",
+                             [(headline_hash, rid) for rid in request_ids])
+            conn.executemany("""
+                INSERT OR REPLACE INTO request_days (request_id, date, payload_hash)
+                SELECT id, ?, ? FROM weather_requests WHERE id = ? AND ? BETWEEN days_from AND days_to
+            """, [(r[2], r[13], rid, r[2]) for rid in request_ids for r in rows])
+    return changes
+
+@instrument("db_op")
+def record_refresh(started_at, requests, locations, failed, days_added, days_changed, days_unchanged):
+    with transaction() as conn:
+        cur = conn.execute("""
+            INSERT INTO forecast_refreshes (started_at, finished_at, requests, locations, failed, days_added, days_changed, days_unchanged)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (started_at, int(time.time()), requests, locations, failed, days_added, days_changed, days_unchanged))
+        return cur.lastrowid
+
+# WATCHLIST
+@instrument("db_op")
+def list_watchlist():
+    return get_conn().execute("SELECT location_key, label FROM watchlist ORDER BY position").fetchall()
+
+@instrument("db_op")
+def add_watch(locations):
+    # (location_key, label) pairs appended in order; keys already watched keep their place
+    now = int(time.time())
+    with transaction() as conn:
+        last = conn.execute("SELECT COALESCE(MAX(position), 0) FROM watchlist").fetchone()[0]
+        conn.executemany(
+            "INSERT OR IGNORE INTO watchlist (location_key, label, position, added_at) VALUES (?, ?, ?, ?)",
+            [(str(key), label, last + i, now) for i, (key, label) in enumerate(locations, 1)],
+        )
+
+@instrument("db_op")
+def remove_watch(location_keys):
+    with transaction() as conn:
+        conn.executemany("DELETE FROM watchlist WHERE location_key = ?", [(str(k),) for k in location_keys])
+
+# OBSERVATIONS
+# resolution -> (rollup table, bucket seconds, source table, source time column, aggregate over the source)
+_RAW_AGG = """COUNT(*) AS n, COUNT(temp_c) AS temp_n, MIN(temp_c) AS temp_min, MAX(temp_c) AS temp_max,
+    SUM(temp_c) AS temp_sum, COUNT(humidity) AS humidity_n, SUM(humidity) AS humidity_sum, MAX(wind_kmh) AS wind_max"""
+_ROLLUP_AGG = """SUM(n) AS n, SUM(temp_n) AS temp_n, MIN(temp_min) AS temp_min, MAX(temp_max) AS temp_max,
+    SUM(temp_sum) AS temp_sum, SUM(humidity_n) AS humidity_n, SUM(humidity_sum) AS humidity_sum, MAX(wind_max) AS wind_max"""
+ROLLUPS = {
+    "hourly": ("observations_hourly", 3600, "observations", "observed_at", _RAW_AGG),
+    "daily": ("observations_daily", 86400, "observations_hourly", "bucket", _ROLLUP_AGG),
+}
+_POINT = "n, temp_min, temp_max, 1.0 * temp_sum / temp_n, 1.0 * humidity_sum / humidity_n, wind_max"
+
+def _rolled_until(conn, name):
+    row = conn.execute("SELECT until FROM rollup_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+@instrument("db_op")
+def record_observations(rows):
+    # rows: (location_key, observed_at, temp_c, realfeel_c, humidity, wind_kmh, icon, text);
+    # the same observation seen twice (cached current conditions) is stored once
+    now = int(time.time())
+    with transaction() as conn:
+        cur = conn.executemany("""
+            INSERT OR IGNORE INTO observations
+                (location_key, observed_at, temp_c, realfeel_c, humidity, wind_kmh, icon, text, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(*r, now) for r in rows])
+        return cur.rowcount
+
+@instrument("db_op")
+def rollup_observations(settle_seconds=900, now=None):
+    """Fold finished hours into observations_hourly, then finished days into observations_daily.
+
+    A bucket is finished settle_seconds after it ends; observations arriving
+    later than that for a rolled bucket stay in the raw table only.
+    Returns the number of buckets written per level.
+    """
+    written = {}
+    limit = int(now or time.time()) - settle_seconds
+    with transaction() as conn:
+        for name, (table, seconds, src, col, agg) in ROLLUPS.items():
+            done = _rolled_until(conn, name)
+            until = limit // seconds * seconds
+            written[name] = 0
+            if until > done:
+                written[name] = conn.execute(f"""
+                    INSERT OR REPLACE INTO {table}
+                        (location_key, bucket, n, temp_n, temp_min, temp_max, temp_sum, humidity_n, humidity_sum, wind_max)
+                    SELECT location_key, {col} / {seconds} * {seconds} AS b, {agg}
+                    FROM {src} WHERE {col} >= ? AND {col} < ? GROUP BY location_key, b
+                """, (done, until)).rowcount
+                conn.execute("INSERT OR REPLACE INTO rollup_state (name, until) VALUES (?, ?)", (name, until))
+                done = until
+            # The next level may only fold buckets this one has finished
+            limit = done
+    return written
+
+@instrument("db_op")
+def prune_observations(raw_days=14, hourly_days=180, daily_days=0, now=None):
+    # Drop rows past each level's retention (0 keeps forever), never rows not yet rolled up
+    now = int(now or time.time())
+    deleted = {}
+    with transaction() as conn:
+        levels = (("observations", "observed_at", raw_days, _rolled_until(conn, "hourly")),
+                  ("observations_hourly", "bucket", hourly_days, _rolled_until(conn, "daily")),
+                  ("observations_daily", "bucket", daily_days, None))
+        for table, col, days, rolled in levels:
+            if not days:
+                continue
+            cutoff = now - days * 86400
+            if rolled is not None:
+                cutoff = min(cutoff, rolled)
+            deleted[table] = conn.execute(f"DELETE FROM {table} WHERE {col} < ?", (cutoff,)).rowcount
+    return deleted
+
+@instrument("db_op")
+def observation_series(location_key, start, end, resolution="hourly"):
+    """Chart points for [start, end) in epoch seconds, oldest first:
+    (time, n, temp_min, temp_max, temp_mean, humidity_mean, wind_max).
+
+    "hourly"/"daily" read the rollup table, plus a tail for buckets not yet
+    rolled up, merged from the finer levels (only rows newer than their own
+    watermark, i.e. hours, not history), so long ranges never scan raw rows.
+    """
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM weather_requests WHERE id = ?", (req_id,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    if resolution == "raw":
+        return conn.execute("""
+            SELECT observed_at, 1, temp_c, temp_c, temp_c, humidity, wind_kmh FROM observations
+            WHERE location_key = ? AND observed_at >= ? AND observed_at < ? ORDER BY observed_at
+        """, (location_key, start, end)).fetchall()
+    table, seconds = ROLLUPS[resolution][:2]
+    first = start // seconds * seconds
+    tail = max(first, _rolled_until(conn, resolution))
+    # Raw rows in rollup shape, merged with unrolled hourly buckets for the daily tail
+    parts = ["""SELECT observed_at AS t, 1 AS n, temp_c IS NOT NULL AS temp_n, temp_c AS temp_min, temp_c AS temp_max,
+                temp_c AS temp_sum, humidity IS NOT NULL AS humidity_n, humidity AS humidity_sum, wind_kmh AS wind_max
+             FROM observations WHERE location_key = ? AND observed_at >= ? AND observed_at < ?"""]
+    params = [location_key, max(tail, _rolled_until(conn, "hourly")), end]
+    if resolution == "daily":
+        parts.append("""SELECT bucket AS t, n, temp_n, temp_min, temp_max, temp_sum, humidity_n, humidity_sum, wind_max
+             FROM observations_hourly WHERE location_key = ? AND bucket >= ? AND bucket < ?""")
+        params += [location_key, tail, end]
+    return conn.execute(f"""
+        SELECT bucket, {_POINT} FROM {table} WHERE location_key = ? AND bucket >= ? AND bucket < ?
+        UNION ALL
+        SELECT b, {_POINT} FROM (
+            SELECT t / {seconds} * {seconds} AS b, {_ROLLUP_AGG} FROM ({" UNION ALL ".join(parts)}) GROUP BY b
+        )
+        ORDER BY 1
+    """, (location_key, first, min(end, tail), *params)).fetchall()
+
+# ACCESS LOG
+@instrument("db_op")
+def log_access(location_key):
+    with transaction() as conn:
+        conn.execute("INSERT INTO location_access (location_key, accessed_at) VALUES (?, ?)", (location_key, int(time.time())))
+
+@instrument("db_op")
+def top_locations(limit=50, since_days=7):
+    # Most-requested keys: saved requests plus recent views
+    return get_conn().execute("""
+        SELECT location_key, SUM(n) AS hits FROM (
+            SELECT location_key, COUNT(*) AS n FROM weather_requests GROUP BY location_key
+            UNION ALL
+            SELECT location_key, COUNT(*) AS n FROM location_access WHERE accessed_at >= ? GROUP BY location_key
+        ) GROUP BY location_key ORDER BY hits DESC LIMIT ?
+    """, (int(time.time()) - since_days * 86400, limit)).fetchall()
+
+@instrument("db_op")
+def prune_access_log(older_than_days=30):
+    with transaction() as conn:
+        conn.execute("DELETE FROM location_access WHERE accessed_at < ?", (int(time.time()) - older_than_days * 86400,))
+
+@instrument("db_op")
+def gc_payloads(revision_days=90):
+    # Prune forecast_revisions recorded more than revision_days ago (0 keeps them all), then
+    # drop raw payloads no longer referenced by a day row, a request snapshot, a revision or a
+    # request headline
+    with transaction() as conn:
+        if revision_days:
+            conn.execute("DELETE FROM forecast_revisions WHERE recorded_at < ?",
+                         (int(time.time()) - revision_days * 86400,))
+        cur = conn.execute("""
+            DELETE FROM forecast_payloads
+            WHERE hash NOT IN (SELECT payload_hash FROM daily_forecasts)
+              AND hash NOT IN (SELECT payload_hash FROM request_days)
+              AND hash NOT IN (SELECT payload_hash FROM forecast_revisions)
+              AND hash NOT IN (SELECT headline_hash FROM weather_requests WHERE headline_hash IS NOT NULL)
+        """)
+        return cur.rowcount
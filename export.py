@@ -0,0 +1,149 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Iterable, Optional, Tuple, BinaryIO
+from xml.sax.saxutils import escape as xml_escape
+
+from db import init_db
+from metrics import timed
+from db_ops import iter_export_rows, EXPORT_COLUMNS
+
+# Streaming exports of saved requests. Rows come from db_ops.iter_export_rows
+# (a cursor generator) and each writer emits them to a binary file object as
+# it goes, so CSV/JSONL/XML memory stays flat however many rows are exported.
+#
+#   python export.py --format csv --out forecasts.csv --label port --from 2024-05-01
+
+
+def _text(fh: BinaryIO) -> io.TextIOWrapper:
+    return io.TextIOWrapper(fh, encoding="utf-8", newline="", write_through=False)
+
+
+def _cell(v) -> str:
+    return "" if v is None else str(v)
+
+
+def write_csv(rows: Iterable[Tuple], fh: BinaryIO, columns=EXPORT_COLUMNS) -> int:
+    out = _text(fh)
+    w = csv.writer(out)
+    w.writerow(columns)
+    n = 0
+    for row in rows:
+        w.writerow(row)
+        n += 1
+    out.flush()
+    out.detach()
+    return n
+
+
+def write_jsonl(rows: Iterable[Tuple], fh: BinaryIO, columns=EXPORT_COLUMNS) -> int:
+    out = _text(fh)
+    n = 0
+    for row in rows:
+        out.write(json.dumps(dict(zip(columns, row))))
+        out.write("\n")
+        n += 1
+    out.flush()
+    out.detach()
+    return n
+
+
+def write_xml(rows: Iterable[Tuple], fh: BinaryIO, columns=EXPORT_COLUMNS,
+              root_tag="Forecast", row_tag="Day") -> int:
+    out = _text(fh)
+    out.write(f"<{root_tag}>\n")
+    n = 0
+    for row in rows:
+        out.write(f"  <{row_tag}>\n")
+        for col, val in zip(columns, row):
+            out.write(f"    <{col}>{xml_escape(_cell(val))}</{col}>\n")
+        out.write(f"  </{row_tag}>\n")
+        n += 1
+    out.write(f"</{root_tag}>")
+    out.flush()
+    out.detach()
+    return n
+
+
+def write_pdf(rows: Iterable[Tuple], fh: BinaryIO, columns=EXPORT_COLUMNS,
+              title="Weather Forecast") -> int:
+    # reportlab keeps finished pages (compressed) until save(); rows themselves are not buffered
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(fh, pagesize=letter, pageCompression=1)
+    width, height = letter
+    x = 40
+
+    def header(y):
+        c.setFont("Helvetica", 10)
+        c.drawString(x, y, " | ".join(columns))
+        y -= 15
+        c.line(x, y, width - x, y)
+        return y - 15
+
+    y = height - 50
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(x, y, title)
+    y = header(y - 20)
+    n = 0
+    for row in rows:
+        if y < 50:
+            c.showPage()
+            y = header(height - 50)
+        c.drawString(x, y, " | ".join(_cell(v) for v in row))
+        y -= 15
+        n += 1
+    c.showPage()
+    c.save()
+    return n
+
+
+# format -> (writer, mime type, file extension)
+FORMATS = {
+    "csv": (write_csv, "text/csv", "csv"),
+    "jsonl": (write_jsonl, "application/x-ndjson", "jsonl"),
+    "xml": (write_xml, "application/xml", "xml"),
+    "pdf": (write_pdf, "application/pdf", "pdf"),
+}
+
+
+def export(fmt: str, fh: BinaryIO, title: Optional[str] = None, **query) -> int:
+    """Stream the rows matching query (see db_ops.iter_export_rows) to fh. Returns rows written."""
+    writer = FORMATS[fmt][0]
+    with timed("export", format=fmt):
+        if fmt == "pdf" and title:
+            return writer(iter_export_rows(**query), fh, title=title)
+        return writer(iter_export_rows(**query), fh)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Export saved weather requests")
+    p.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    p.add_argument("--out", help="output file (default: stdout)")
+    p.add_argument("--ids", help="comma-separated request ids")
+    p.add_argument("--label", help="location label prefix")
+    p.add_argument("--key", help="AccuWeather location key")
+    p.add_argument("--from", dest="date_from", help="requests overlapping this date or later (YYYY-MM-DD)")
+    p.add_argument("--to", dest="date_to", help="requests overlapping this date or earlier (YYYY-MM-DD)")
+    args = p.parse_args()
+
+    init_db()
+    query = {
+        "request_ids": [int(i) for i in args.ids.split(",")] if args.ids else None,
+        "label": args.label, "location_key": args.key,
+        "date_from": args.date_from, "date_to": args.date_to,
+    }
+    if args.out:
+        with open(args.out, "wb") as fh:
+            n = export(args.format, fh, **query)
+    else:
+        n = export(args.format, sys.stdout.buffer, **query)
+        sys.stdout.buffer.flush()
+    print(f"{n} rows exported", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
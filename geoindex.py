@@ -0,0 +1,225 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+import db
+from accuweather_client import search_by_text, search_by_postal, search_by_geo, ip_lookup_coords
+
+# Local index of every AccuWeather location we have resolved. Coordinates are
+# bucketed into a lat/lon grid so "lat,lon" queries near a known location
+# resolve without an upstream call. Text and postal queries are answered
+# locally only when the same query was sent upstream before and its full
+# result set recorded (known_queries); an indexed location that merely
+# matches the name (or a prefix of it) never answers, since upstream may
+# know others. Stored beside the response cache so replicas share it.
+
+INDEX_FILE = os.getenv("GEO_INDEX_FILE", os.getenv("ACCU_CACHE_FILE", "accuweather_cache.db"))
+RADIUS_KM = float(os.getenv("GEO_RADIUS_KM", "2"))
+CELL_DEG = 0.1  # grid cell size (~11 km of latitude)
+MAX_TEXT_MATCHES = 10
+QUERY_TTL = int(os.getenv("GEO_QUERY_TTL", str(30 * 86400)))  # recorded result sets are re-fetched after this
+IP_TTL = 3600  # the server's public IP rarely moves
+
+_lock = threading.Lock()
+_stats = {"lookups": 0, "geo_hits": 0, "text_hits": 0, "postal_hits": 0, "upstream": 0}
+_ip_guess = (0.0, None)
+_ready = set()
+
+
+def _conn():
+    conn = db.get_conn(INDEX_FILE)
+    if INDEX_FILE not in _ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS known_locations (
+                key TEXT PRIMARY KEY,
+                name_lc TEXT NOT NULL,
+                english_lc TEXT,
+                postal TEXT,
+                lat REAL,
+                lon REAL,
+                cell_lat INTEGER,
+                cell_lon INTEGER,
+                body TEXT NOT NULL,
+                updated_at INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_known_locations_cell ON known_locations(cell_lat, cell_lon)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_known_locations_name ON known_locations(name_lc)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_known_locations_english ON known_locations(english_lc)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_known_locations_postal ON known_locations(postal)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS known_queries (
+                kind TEXT NOT NULL,
+                query TEXT NOT NULL,
+                keys TEXT NOT NULL,
+                fetched_at INTEGER NOT NULL,
+                PRIMARY KEY (kind, query)
+            ) WITHOUT ROWID
+        """)
+        _ready.add(INDEX_FILE)
+    return conn
+
+
+def _count(name: str):
+    with _lock:
+        _stats[name] += 1
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        s = dict(_stats)
+    s["avoided_upstream"] = s["geo_hits"] + s["text_hits"] + s["postal_hits"]
+    return s
+
+
+def _cell(v: float) -> int:
+    return math.floor(v / CELL_DEG)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def add(locations: List[Dict[str, Any]]):
+    """Index resolved AccuWeather locations (search/geoposition results)."""
+    rows = []
+    now = int(time.time())
+    for loc in locations:
+        if not isinstance(loc, dict) or not loc.get("Key"):
+            continue
+        geo = loc.get("GeoPosition") or {}
+        lat, lon = geo.get("Latitude"), geo.get("Longitude")
+        has_geo = lat is not None and lon is not None
+        rows.append((
+            str(loc["Key"]),
+            (loc.get("LocalizedName") or "").lower(),
+            (loc.get("EnglishName") or "").lower() or None,
+            (loc.get("PrimaryPostalCode") or "").replace(" ", "").lower() or None,
+            lat, lon,
+            _cell(lat) if has_geo else None, _cell(lon) if has_geo else None,
+            json.dumps(loc, separators=(",", ":")), now,
+        ))
+    if rows:
+        _conn()
+        with db.transaction(INDEX_FILE) as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO known_locations
+                    (key, name_lc, english_lc, postal, lat, lon, cell_lat, cell_lon, body, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+
+
+def nearest(lat: float, lon: float, radius_km: float = RADIUS_KM) -> Optional[Dict[str, Any]]:
+    # Scan only the grid cells overlapping the radius, then pick the closest by haversine
+    dlat = radius_km / 111.0
+    dlon = radius_km / max(1e-6, 111.0 * math.cos(math.radians(lat)))
+    rows = _conn().execute("""
+        SELECT lat, lon, body FROM known_locations
+        WHERE cell_lat BETWEEN ? AND ? AND cell_lon BETWEEN ? AND ?
+    """, (_cell(lat - dlat), _cell(lat + dlat), _cell(lon - dlon), _cell(lon + dlon))).fetchall()
+    best, best_d = None, radius_km
+    for rlat, rlon, body in rows:
+        d = haversine_km(lat, lon, rlat, rlon)
+        if d <= best_d:
+            best, best_d = body, d
+    return json.loads(best) if best else None
+
+
+def _normalise(kind: str, query: str) -> str:
+    if kind == "postal":
+        return query.replace(" ", "").lower()
+    return " ".join(query.lower().split())
+
+
+def _bodies(keys: List[str]) -> Optional[List[Dict[str, Any]]]:
+    if not keys:
+        return []
+    rows = dict(_conn().execute(
+        f"SELECT key, body FROM known_locations WHERE key IN ({','.join('?' * len(keys))})", keys
+    ).fetchall())
+    if len(rows) < len(set(keys)):
+        return None
+    return [json.loads(rows[k]) for k in keys]
+
+
+def remembered(kind: str, query: str) -> Optional[List[Dict[str, Any]]]:
+    # The upstream result set last recorded for this query, in upstream order
+    row = _conn().execute(
+        "SELECT keys, fetched_at FROM known_queries WHERE kind = ? AND query = ?", (kind, _normalise(kind, query))
+    ).fetchone()
+    if not row or time.time() - row[1] > QUERY_TTL:
+        return None
+    return _bodies(json.loads(row[0]))
+
+
+def remember(kind: str, query: str, results: List[Dict[str, Any]]):
+    keys = [str(r["Key"]) for r in results if isinstance(r, dict) and r.get("Key")]
+    _conn()
+    with db.transaction(INDEX_FILE) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO known_queries (kind, query, keys, fetched_at) VALUES (?, ?, ?, ?)",
+            (kind, _normalise(kind, query), json.dumps(keys), int(time.time())),
+        )
+
+
+def resolve_coords(lat: float, lon: float, radius_km: float = RADIUS_KM) -> Optional[Dict[str, Any]]:
+    _count("lookups")
+    loc = nearest(lat, lon, radius_km)
+    if loc:
+        _count("geo_hits")
+        return loc
+    _count("upstream")
+    loc = search_by_geo(lat, lon)
+    if loc:
+        add([loc])
+    return loc
+
+
+def resolve(query: str, radius_km: float = RADIUS_KM) -> List[Dict[str, Any]]:
+    """Resolve a search box query ("lat,lon", postal code or text) to locations.
+
+    Text and postal queries are answered from the result set recorded for
+    the same normalised query; anything else goes upstream, and the results
+    are indexed and recorded for next time.
+    """
+    q = query.strip()
+    if "," in q:
+        try:
+            lat, lon = [float(x.strip()) for x in q.split(",", 1)]
+        except ValueError:
+            lat = lon = None
+        if lat is not None:
+            loc = resolve_coords(lat, lon, radius_km)
+            return [loc] if loc else []
+    _count("lookups")
+    if q.replace("-", "").replace(" ", "").isdigit():
+        kind, hit_stat, upstream = "postal", "postal_hits", search_by_postal
+    else:
+        kind, hit_stat, upstream = "text", "text_hits", search_by_text
+    hits = remembered(kind, q)
+    if hits is not None:
+        _count(hit_stat)
+        return hits
+    _count("upstream")
+    results = upstream(q)
+    if isinstance(results, list):
+        add(results)
+        remember(kind, q, results)
+    return results
+
+
+def ip_location() -> Optional[Dict[str, Any]]:
+    # Server-side IP lookup, remembered for IP_TTL so repeat clicks skip ipinfo
+    global _ip_guess
+    at, guess = _ip_guess
+    if guess is None or time.time() - at > IP_TTL:
+        guess = ip_lookup_coords()
+        if guess:
+            _ip_guess = (time.time(), guess)
+    return guess
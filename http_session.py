@@ -0,0 +1,193 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, Dict, Any, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Pool / retry knobs (override from .env)
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "20"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (connect, read) timeouts per endpoint, e.g. HTTP_TIMEOUT_FORECAST=3,10
+TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "default": (3.05, 15),
+    "search": (3.05, 10),
+    "current": (3.05, 8),
+    "forecast": (3.05, 10),
+    "ipinfo": (3.05, 5),
+}
+for _name in list(TIMEOUTS):
+    _env = os.getenv(f"HTTP_TIMEOUT_{_name.upper()}")
+    if _env:
+        _c, _r = [float(x) for x in _env.split(",")]
+        TIMEOUTS[_name] = (_c, _r)
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _new_stats() -> Dict[str, float]:
+    return {
+        "calls": 0, "errors": 0, "retries": 0,
+        "new_connections": 0, "reused_connections": 0,
+        "handshake_s": 0.0, "transfer_s": 0.0, "backoff_s": 0.0,
+    }
+
+
+def _record(endpoint: str, **deltas):
+    with _stats_lock:
+        s = _stats.setdefault(endpoint, _new_stats())
+        for k, v in deltas.items():
+            s[k] += v
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    # Per-endpoint counters; handshake_s is TCP+TLS connect time, transfer_s the rest
+    with _stats_lock:
+        return {k: dict(v) for k, v in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def last_call() -> Optional[Dict[str, Any]]:
+    # Timing breakdown of the most recent call made from this thread
+    return getattr(_local, "last_call", None)
+
+
+# Connections that time their own connect() so we can split handshake from transfer
+class _TimedConnectMixin:
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        _local.handshake_s = getattr(_local, "handshake_s", 0.0) + time.perf_counter() - t0
+        _local.new_connections = getattr(_local, "new_connections", 0) + 1
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool, "https": _TimedHTTPSPool}
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    # One keep-alive session per process, shared by every thread
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = _TimedAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=True)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def _retry_after(r: requests.Response) -> Optional[float]:
+    value = r.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: uniform(0, base * 2^attempt), capped
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, endpoint: str = "default",
+        before_attempt: Optional[Callable[[], None]] = None) -> requests.Response:
+    """GET through the shared pool, retrying 429/5xx and connection errors.
+
+    Returns the last response (which may still be an error status) or re-raises
+    the last requests exception once retries are exhausted. before_attempt is
+    called ahead of every attempt, retries included (e.g. to take a rate-limit
+    token); whatever it raises propagates and ends the retries.
+    """
+    timeout = TIMEOUTS.get(endpoint, TIMEOUTS["default"])
+    session = get_session()
+    attempt = 0
+    while True:
+        if before_attempt is not None:
+            before_attempt()
+        _local.handshake_s = 0.0
+        _local.new_connections = 0
+        t0 = time.perf_counter()
+        try:
+            r = session.get(url, params=params, timeout=timeout)
+            err = None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            r, err = None, e
+        total = time.perf_counter() - t0
+        handshake = _local.handshake_s
+        new_conns = _local.new_connections
+        _local.last_call = {
+            "endpoint": endpoint, "attempt": attempt,
+            "status": r.status_code if r is not None else None,
+            "new_connection": bool(new_conns),
+            "handshake_s": handshake, "transfer_s": total - handshake,
+        }
+        _record(
+            endpoint, calls=1,
+            new_connections=new_conns, reused_connections=0 if new_conns else 1,
+            handshake_s=handshake, transfer_s=total - handshake,
+        )
+
+        retryable = err is not None or r.status_code in RETRY_STATUSES
+        if not retryable:
+            return r
+        if attempt >= MAX_RETRIES:
+            _record(endpoint, errors=1)
+            if err is not None:
+                raise err
+            return r
+
+        wait = _backoff(attempt)
+        if r is not None:
+            ra = _retry_after(r)
+            if ra is not None:
+                wait = min(BACKOFF_MAX, ra)
+        _record(endpoint, retries=1, backoff_s=wait)
+        time.sleep(wait)
+        attempt += 1
@@ -0,0 +1,269 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+# In-process latency histograms for the hot paths (AccuWeather calls, db_ops,
+# SQLite write-lock waits, forecast JSON encode/decode, DataFrame building,
+# exports). Recording is a perf_counter pair, a bisect and a locked add, so
+# it stays on in production; METRICS=0 turns every hook into a no-op.
+#
+# Read them with snapshot() (diagnostics panel), render_prometheus() (the
+# API's /metrics) or, for the Streamlit process, METRICS_FILE=path, which
+# rewrites a Prometheus textfile every METRICS_FILE_INTERVAL seconds.
+
+ENABLED = os.getenv("METRICS", "1").lower() not in ("0", "false", "no")
+PREFIX = "weather_"
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "accuweather_request": "AccuWeather upstream calls (after local cache/coalescing), including retries",
+    "db_op": "db_ops function calls",
+    "db_lock_wait": "Time to acquire the SQLite write lock (BEGIN IMMEDIATE)",
+    "json": "Forecast payload JSON encode/decode",
+    "render": "DataFrame building for the UI",
+    "export": "Export runs, per format",
+    "app_rerun": "Streamlit script reruns",
+    "api_request": "HTTP API requests",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "errors", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, error: bool = False):
+        i = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+            if error:
+                self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Linear interpolation inside the bucket holding the q-th observation,
+        # as Prometheus' histogram_quantile does
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen, lower = 0, 0.0
+        for bound, n in zip(BUCKETS, self.counts):
+            if n and seen + n >= rank:
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            lower = bound
+        return BUCKETS[-1]
+
+
+_registry: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+_registry_lock = threading.Lock()
+# Call-site keys (labels in the order given) -> histogram, so hot paths skip the sort
+_fast: Dict[tuple, Histogram] = {}
+
+
+def histogram(name: str, **labels) -> Histogram:
+    fast_key = (name, *labels.items())
+    h = _fast.get(fast_key)
+    if h is None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with _registry_lock:
+            h = _fast[fast_key] = _registry.setdefault(key, Histogram())
+    return h
+
+
+def observe(name: str, seconds: float, error: bool = False, **labels):
+    if ENABLED:
+        histogram(name, **labels).observe(seconds, error)
+
+
+class timed:
+    """Context manager recording the block's duration; an exception counts as an error."""
+
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, name: str, **labels):
+        self.hist = histogram(name, **labels) if ENABLED else None
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.hist is not None:
+            self.hist.observe(time.perf_counter() - self.t0, exc_type is not None)
+        return False
+
+
+def instrument(name: str, **labels):
+    """Decorator form of timed(); labels default to op=<function name>.
+
+    Generator functions are timed from first next() to exhaustion, so a
+    streamed cursor is measured for the whole read rather than its creation.
+    """
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+        hist = histogram(name, **(labels or {"op": fn.__name__}))
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen(*args, **kwargs):
+                t0 = time.perf_counter()
+                failed = True
+                try:
+                    yield from fn(*args, **kwargs)
+                    failed = False
+                except GeneratorExit:
+                    # Consumer stopped early; not a failure
+                    failed = False
+                    raise
+                finally:
+                    hist.observe(time.perf_counter() - t0, failed)
+            return gen
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            t0 = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                hist.observe(time.perf_counter() - t0, failed)
+        return call
+    return wrap
+
+
+def reset():
+    # Zero every histogram in place; decorated functions keep their references
+    with _registry_lock:
+        for h in _registry.values():
+            with h._lock:
+                h.counts = [0] * (len(BUCKETS) + 1)
+                h.sum = 0.0
+                h.count = 0
+                h.errors = 0
+
+
+def snapshot() -> List[Dict[str, Any]]:
+    """One row per recorded histogram: count, errors, mean and estimated p50/p95/p99 (ms)."""
+    with _registry_lock:
+        items = list(_registry.items())
+    ms = lambda v: None if v is None else round(v * 1000, 2)
+    rows = []
+    for (name, labels), h in sorted(items):
+        with h._lock:
+            count, total, errors = h.count, h.sum, h.errors
+        if not count:
+            continue
+        rows.append({
+            "metric": name, "labels": ",".join(f"{k}={v}" for k, v in labels),
+            "count": count, "errors": errors,
+            "error_rate": round(errors / count, 4),
+            "mean_ms": ms(total / count),
+            "p50_ms": ms(h.quantile(0.5)), "p95_ms": ms(h.quantile(0.95)), "p99_ms": ms(h.quantile(0.99)),
+            "total_s": round(total, 3),
+        })
+    return rows
+
+
+def _labels(pairs, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in pairs]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition format (v0.0.4)."""
+    with _registry_lock:
+        items = sorted(_registry.items())
+    families: Dict[str, list] = {}
+    for (name, labels), h in items:
+        with h._lock:
+            families.setdefault(name, []).append((labels, list(h.counts), h.sum, h.count, h.errors))
+    out = []
+    for name, series in families.items():
+        metric = f"{PREFIX}{name}_seconds"
+        out.append(f"# HELP {metric} {HELP.get(name, name)}")
+        out.append(f"# TYPE {metric} histogram")
+        for labels, counts, total, count, _ in series:
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                out.append(f"{metric}_bucket{_labels(labels, le)} {cumulative}")
+            out.append(f"{metric}_sum{_labels(labels)} {total}")
+            out.append(f"{metric}_count{_labels(labels)} {count}")
+        errors = f"{PREFIX}{name}_errors_total"
+        out.append(f"# HELP {errors} Failed {name} calls")
+        out.append(f"# TYPE {errors} counter")
+        for labels, _, _, _, n_errors in series:
+            out.append(f"{errors}{_labels(labels)} {n_errors}")
+    return "\n".join(out) + "\n"
+
+
+def write_textfile(path: str):
+    # Atomic replace so a scraper never reads a half-written file
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+_exporter: Optional[threading.Thread] = None
+
+
+def start_file_exporter(path: Optional[str] = None, interval: Optional[float] = None) -> Optional[threading.Thread]:
+    """Rewrite the Prometheus textfile periodically (once per process); no-op without a path."""
+    global _exporter
+    path = path or os.getenv("METRICS_FILE")
+    if not path or not ENABLED:
+        return None
+    interval = interval or float(os.getenv("METRICS_FILE_INTERVAL", "15"))
+    with _registry_lock:
+        if _exporter is not None:
+            return _exporter
+
+        def loop():
+            while True:
+                try:
+                    write_textfile(path)
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        _exporter = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+        _exporter.start()
+    return _exporter
+
+
+# Per-rerun cProfile capture for the Streamlit app
+
+def start_profile():
+    import cProfile
+
+    prof = cProfile.Profile()
+    prof.enable()
+    return prof
+
+
+def stop_profile(prof, limit: int = 30, sort: str = "cumulative") -> str:
+    import io
+    import pstats
+
+    prof.disable()
+    buf = io.StringIO()
+    pstats.Stats(prof, stream=buf).strip_dirs().sort_stats(sort).print_stats(limit)
+    return buf.getvalue()
@@ -0,0 +1,133 @@
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Compact views of AccuWeather payloads for the UI. The details=true
+# responses carry dozens of nested fields; these slotted dataclasses keep
+# only what the app renders, so memoised results (st.cache_data pickles them)
+# stay small and the templates read attributes instead of .get() chains.
+# Repeated strings (phrases, countries, units) are interned.
+#
+# The response cache and the database still hold the raw JSON: the API
+# serves it as-is and saved requests store the full forecast.
+
+def _intern(s: Optional[str]) -> str:
+    return sys.intern(s) if s else ""
+
+
+def _dig(d: Any, *path, default=None):
+    for k in path:
+        if not isinstance(d, dict):
+            return default
+        d = d.get(k)
+    return default if d is None else d
+
+
+@dataclass(slots=True)
+class Location:
+    key: str
+    name: str
+    admin: str = ""
+    country: str = ""
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+    @classmethod
+    def from_json(cls, d: Dict[str, Any]) -> "Location":
+        return cls(
+            key=str(d.get("Key", "")),
+            name=d.get("LocalizedName") or d.get("EnglishName") or "",
+            admin=_intern(_dig(d, "AdministrativeArea", "LocalizedName", default="")),
+            country=_intern(_dig(d, "Country", "LocalizedName", default="")),
+            lat=_dig(d, "GeoPosition", "Latitude"),
+            lon=_dig(d, "GeoPosition", "Longitude"),
+        )
+
+    @property
+    def label(self) -> str:
+        return ", ".join(p for p in (self.name, self.admin, self.country) if p)
+
+
+@dataclass(slots=True)
+class Current:
+    text: str
+    icon: int
+    temp_c: Optional[float] = None
+    realfeel_c: Optional[float] = None
+    humidity: Optional[int] = None
+    wind_kmh: Optional[float] = None
+    uv: Optional[int] = None
+    observed_at: Optional[int] = None
+
+    @classmethod
+    def from_json(cls, d: Dict[str, Any]) -> "Current":
+        return cls(
+            text=_intern(d.get("WeatherText") or ""),
+            icon=d.get("WeatherIcon") or 1,
+            temp_c=_dig(d, "Temperature", "Metric", "Value"),
+            realfeel_c=_dig(d, "RealFeelTemperature", "Metric", "Value"),
+            humidity=d.get("RelativeHumidity"),
+            wind_kmh=_dig(d, "Wind", "Speed", "Metric", "Value"),
+            uv=d.get("UVIndex"),
+            observed_at=d.get("EpochTime"),
+        )
+
+
+@dataclass(slots=True)
+class Day:
+    date: str
+    epoch: Optional[int]
+    min: Optional[float]
+    max: Optional[float]
+    unit: str
+    day_icon: int
+    day_phrase: str
+    night_icon: int
+    night_phrase: str
+    precip: bool = False
+
+    @classmethod
+    def from_json(cls, d: Dict[str, Any]) -> "Day":
+        return cls(
+            date=d.get("Date", ""),
+            epoch=d.get("EpochDate"),
+            min=_dig(d, "Temperature", "Minimum", "Value"),
+            max=_dig(d, "Temperature", "Maximum", "Value"),
+            unit=_intern(_dig(d, "Temperature", "Maximum", "Unit", default="")),
+            day_icon=_dig(d, "Day", "Icon", default=1),
+            day_phrase=_intern(_dig(d, "Day", "IconPhrase", default="")),
+            night_icon=_dig(d, "Night", "Icon", default=33),
+            night_phrase=_intern(_dig(d, "Night", "IconPhrase", default="")),
+            precip=bool(_dig(d, "Day", "HasPrecipitation") or _dig(d, "Night", "HasPrecipitation")),
+        )
+
+
+@dataclass(slots=True)
+class Forecast:
+    headline: str
+    days: Tuple[Day, ...]
+
+    @classmethod
+    def from_json(cls, d: Dict[str, Any]) -> "Forecast":
+        return cls(
+            headline=_dig(d, "Headline", "Text", default=""),
+            days=tuple(Day.from_json(x) for x in d.get("DailyForecasts") or []),
+        )
+
+
+def parse_locations(results: Any) -> List[Location]:
+    # Search endpoints return a list; geoposition search returns one object
+    if isinstance(results, dict):
+        results = [results]
+    return [Location.from_json(r) for r in results or [] if isinstance(r, dict) and r.get("Key")]
+
+
+def parse_current(cc: Any) -> Optional[Current]:
+    # currentconditions returns a one-element list
+    if isinstance(cc, list) and cc and isinstance(cc[0], dict):
+        return Current.from_json(cc[0])
+    return None
+
+
+def parse_forecast(f: Any) -> Forecast:
+    return Forecast.from_json(f if isinstance(f, dict) else {})
@@ -0,0 +1,118 @@
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Dict, Any, Callable, Iterator, List, Tuple
+
+from accuweather_client import AccuError, QuotaError
+from db import init_db
+
+# Shared plumbing for the periodic background jobs (prewarm.py, archive.py):
+# a daemon thread that runs a pass every `interval` seconds, a budgeted
+# fan-out over location keys, and the common command line.
+
+log = logging.getLogger("periodic")
+
+
+def run_budgeted(keys: List[str], fn: Callable[[str], Any], workers: int, result: Dict[str, Any],
+                 log: logging.Logger = log) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, fn(key)) with at most `workers` calls in flight.
+
+    Keys are submitted as earlier ones finish, and submission stops at the
+    first QuotaError: the budget reserve is shared, so later keys would only
+    queue on the ledger and the rate limiter. Failures are counted in
+    result["errors"] / result["quota_stopped"].
+    """
+    pending = iter(keys)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        running = {ex.submit(fn, k): k for k in islice(pending, workers)}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                key = running.pop(fut)
+                try:
+                    yield key, fut.result()
+                except QuotaError as e:
+                    # Budget reserved for interactive use; later keys will hit the same wall
+                    if not result["quota_stopped"]:
+                        log.info("%s stopped by budget: %s", log.name, e)
+                    result["quota_stopped"] = True
+                except AccuError as e:
+                    result["errors"] += 1
+                    log.warning("%s %s failed: %s", log.name, key, e)
+            if not result["quota_stopped"]:
+                for k in islice(pending, len(done)):
+                    running[ex.submit(fn, k)] = k
+
+
+class PeriodicWorker(threading.Thread):
+    """Daemon thread calling work() every `interval` seconds until stop().
+
+    Each pass starts `interval` seconds after the previous one started;
+    last_result holds the latest return value and a failed pass is logged.
+    """
+
+    def __init__(self, name: str, work: Callable[[], Dict[str, Any]], interval: float,
+                 log: logging.Logger = log):
+        super().__init__(name=name, daemon=True)
+        self.work = work
+        self.interval = interval
+        self.log = log
+        self.last_result: Dict[str, Any] = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            t0 = time.monotonic()
+            try:
+                self.last_result = self.work()
+            except Exception:
+                self.log.exception("%s cycle failed", self.name)
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - t0)))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_started: Dict[str, PeriodicWorker] = {}
+_started_lock = threading.Lock()
+
+
+def start_background(name: str, make: Callable[[], PeriodicWorker]) -> PeriodicWorker:
+    # Idempotent: one thread per name per process
+    with _started_lock:
+        if name not in _started:
+            _started[name] = make()
+            _started[name].start()
+        return _started[name]
+
+
+def make_parser(description: str, interval: float, top: int, workers: int) -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--once", action="store_true", help="run a single pass and exit")
+    p.add_argument("--interval", type=float, default=interval)
+    p.add_argument("--top", type=int, default=top)
+    p.add_argument("--workers", type=int, default=workers)
+    return p
+
+
+def parse_args(p: argparse.ArgumentParser) -> argparse.Namespace:
+    args = p.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    init_db()
+    return args
+
+
+def run_cli(w: PeriodicWorker, once: bool = False) -> None:
+    # --once prints a single pass; otherwise run until the thread dies or Ctrl-C
+    if once:
+        print(w.work())
+        return
+    w.start()
+    try:
+        while w.is_alive():
+            w.join(1)
+    except KeyboardInterrupt:
+        w.stop()
@@ -0,0 +1,69 @@
+import logging
+import os
+from typing import Dict, Any, List
+
+import periodic
+import ratelimit
+from accuweather_client import warm_location
+from db_ops import top_locations, list_watchlist, prune_access_log, gc_payloads
+from periodic import PeriodicWorker, run_budgeted
+
+# Keeps current conditions and forecasts for popular/saved locations warm in
+# the shared cache so page loads rarely wait on AccuWeather. Run it as its own
+# process (`python prewarm.py`) or start_background() inside the app.
+
+log = logging.getLogger("prewarm")
+
+TOP_N = 50
+WORKERS = 4
+INTERVAL = 60
+# Refresh this many seconds before the cached entry stops being fresh
+LEAD = {"current": 90, "forecast": 600}
+# Days of forecast_revisions (drift history) kept by the payload GC; 0 keeps everything
+REVISION_DAYS = int(os.getenv("FORECAST_REVISION_DAYS", "90"))
+
+
+def popular_keys(limit: int = TOP_N) -> List[str]:
+    # Watchlist sites first (the dashboard loads them all at once), then the most requested
+    watched = [k for k, _ in list_watchlist()]
+    return list(dict.fromkeys(watched + [k for k, _ in top_locations(limit)]))
+
+
+def _warm_one(key: str) -> int:
+    with ratelimit.priority(ratelimit.BACKGROUND):
+        return warm_location(key, LEAD)
+
+
+def run_once(limit: int = TOP_N, workers: int = WORKERS) -> Dict[str, Any]:
+    keys = popular_keys(limit)
+    result = {"keys": len(keys), "refreshed": 0, "errors": 0, "quota_stopped": False}
+    for _, refreshed in run_budgeted(keys, _warm_one, workers, result, log):
+        result["refreshed"] += refreshed
+    return result
+
+
+def cycle(limit: int = TOP_N, workers: int = WORKERS) -> Dict[str, Any]:
+    # One background pass: warm, then trim the access log and unreferenced payloads
+    result = run_once(limit, workers)
+    prune_access_log()
+    gc_payloads(REVISION_DAYS)
+    return result
+
+
+def make_worker(interval: float = INTERVAL, limit: int = TOP_N, workers: int = WORKERS) -> PeriodicWorker:
+    return PeriodicWorker("prewarmer", lambda: cycle(limit, workers), interval, log)
+
+
+def start_background(**kwargs) -> PeriodicWorker:
+    # Idempotent: one pre-warmer thread per process
+    return periodic.start_background("prewarmer", lambda: make_worker(**kwargs))
+
+
+def main():
+    p = periodic.make_parser("Pre-warm AccuWeather cache for popular locations", INTERVAL, TOP_N, WORKERS)
+    args = periodic.parse_args(p)
+    periodic.run_cli(make_worker(args.interval, args.top, args.workers), args.once)
+
+
+if __name__ == "__main__":
+    main()
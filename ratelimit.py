@@ -0,0 +1,208 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any
+
+import db
+
+# Client-side budget for AccuWeather: a token bucket per API key for the
+# per-second limit, plus a daily call ledger in SQLite shared by every process.
+
+RATE_PER_SEC = float(os.getenv("ACCU_RATE_PER_SEC", "5"))
+BURST = float(os.getenv("ACCU_BURST", "10"))
+DAILY_QUOTA = int(os.getenv("ACCU_DAILY_QUOTA", "50"))
+# Below this fraction of the daily quota, serve cached data rather than call upstream
+DEGRADE_AT = float(os.getenv("ACCU_DEGRADE_AT", "0.1"))
+# Background work may not dip into the last BACKGROUND_RESERVE of the daily quota
+BACKGROUND_RESERVE = float(os.getenv("ACCU_BACKGROUND_RESERVE", "0.3"))
+MAX_WAIT = {"interactive": 5.0, "background": 60.0}
+LEDGER_FILE = os.getenv("ACCU_QUOTA_FILE", os.getenv("ACCU_CACHE_FILE", "accuweather_cache.db"))
+
+INTERACTIVE, BACKGROUND = "interactive", "background"
+
+
+class RateLimited(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float = RATE_PER_SEC, burst: float = BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait: float, reserve: float = 0.0) -> float:
+        """Take one token, sleeping up to max_wait. Returns seconds waited.
+
+        `reserve` tokens are left in the bucket for higher-priority callers.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1 + reserve:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 + reserve - self.tokens) / self.rate
+            if waited + delay > max_wait:
+                raise RateLimited(f"Rate limit: would wait {waited + delay:.1f}s (max {max_wait:.0f}s)")
+            time.sleep(delay)
+            waited += delay
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+class QuotaLedger:
+    """Calls per API key per UTC day, persisted so restarts/replicas share the count."""
+
+    def __init__(self, path: str = LEDGER_FILE, daily_quota: int = DAILY_QUOTA):
+        self.path = path
+        self.daily_quota = daily_quota
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS api_quota (
+                key_hash TEXT NOT NULL,
+                day TEXT NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (key_hash, day)
+            )
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        return db.get_conn(self.path)
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def used(self, key_hash: str) -> int:
+        row = self._conn().execute(
+            "SELECT used FROM api_quota WHERE key_hash = ? AND day = ?", (key_hash, self._today())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def consume(self, key_hash: str, floor: int = 0) -> int:
+        # Atomically count one call unless it would leave fewer than `floor` calls. Returns calls left.
+        day = self._today()
+        with db.transaction(self.path) as conn:
+            row = conn.execute("SELECT used FROM api_quota WHERE key_hash = ? AND day = ?", (key_hash, day)).fetchone()
+            used = row[0] if row else 0
+            if self.daily_quota - used <= floor:
+                raise RateLimited(f"Daily AccuWeather quota exhausted ({used}/{self.daily_quota})")
+            conn.execute("""
+                INSERT INTO api_quota (key_hash, day, used) VALUES (?, ?, 1)
+                ON CONFLICT(key_hash, day) DO UPDATE SET used = used + 1
+            """, (key_hash, day))
+        return self.daily_quota - used - 1
+
+
+_local = threading.local()
+_lock = threading.Lock()
+_buckets: Dict[str, TokenBucket] = {}
+_ledger = None
+_stats = {"acquired": 0, "rejected": 0, "waits": 0, "wait_s": 0.0, "degraded_serves": 0}
+
+
+def _key_hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def _bucket(api_key: str) -> TokenBucket:
+    with _lock:
+        b = _buckets.get(api_key)
+        if b is None:
+            b = _buckets[api_key] = TokenBucket()
+        return b
+
+
+def get_ledger() -> QuotaLedger:
+    global _ledger
+    if _ledger is None:
+        with _lock:
+            if _ledger is None:
+                _ledger = QuotaLedger()
+    return _ledger
+
+
+def current_priority() -> str:
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+@contextmanager
+def priority(level: str):
+    # e.g. `with ratelimit.priority(ratelimit.BACKGROUND): ...` for refresh jobs
+    prev = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = prev
+
+
+def _count(name: str, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+def acquire(api_key: str):
+    """Spend one upstream call for api_key, waiting for a token if needed.
+
+    Background callers keep a reserve of both per-second tokens and daily
+    quota free for interactive page loads. Raises RateLimited when the call
+    cannot be made.
+    """
+    prio = current_priority()
+    background = prio == BACKGROUND
+    try:
+        reserve = min(BURST - 1, BURST * 0.5) if background else 0.0
+        waited = _bucket(api_key).acquire(MAX_WAIT[prio], reserve=reserve)
+        floor = int(DAILY_QUOTA * BACKGROUND_RESERVE) if background else 0
+        get_ledger().consume(_key_hash(api_key), floor=floor)
+    except RateLimited:
+        _count("rejected")
+        raise
+    _count("acquired")
+    if waited:
+        _count("waits")
+        _count("wait_s", waited)
+
+
+def remaining(api_key: str) -> int:
+    return max(0, DAILY_QUOTA - get_ledger().used(_key_hash(api_key)))
+
+
+def degraded(api_key: str) -> bool:
+    # True once the day's budget is nearly gone: callers should prefer any cached copy
+    return remaining(api_key) <= DAILY_QUOTA * DEGRADE_AT
+
+
+def note_degraded_serve():
+    _count("degraded_serves")
+
+
+def stats(api_key: str) -> Dict[str, Any]:
+    with _lock:
+        s = dict(_stats)
+    used = get_ledger().used(_key_hash(api_key))
+    s.update({
+        "tokens": round(_bucket(api_key).available(), 2),
+        "rate_per_sec": RATE_PER_SEC,
+        "daily_quota": DAILY_QUOTA,
+        "daily_used": used,
+        "daily_remaining": max(0, DAILY_QUOTA - used),
+        "degraded": degraded(api_key),
+    })
+    return s
@@ -0,0 +1,96 @@
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from db import init_db
+from db_ops import refresh_targets, merge_forecast, record_refresh
+
+# Refresh saved requests with the latest forecast_5day, fetched upstream
+# past the response cache (and written back to it). The selected requests
+# are grouped by (location_key, units) and each group costs one upstream
+# call: 10k requests over 500 cities is 500 fetches. Only new or changed
+# days are written to daily_forecasts, and only the selected requests'
+# snapshots move to them; forecast_revisions keeps the history and
+# forecast_refreshes logs each run.
+#
+#   python refresh.py --ids 12,15
+#   python refresh.py --label port --from 2024-05-01
+
+CHUNK = 100  # locations fetched and merged per round
+FETCH_CONCURRENCY = 8
+
+
+def refresh(request_ids: Optional[Iterable[int]] = None, concurrency: int = FETCH_CONCURRENCY,
+            progress=None, **filters) -> Dict[str, Any]:
+    """Refresh the requests matching request_ids/filters (see db_ops.list_requests_page).
+
+    Returns run stats plus `changes`: location_key -> list of changed days.
+    Locations whose fetch failed are listed under `errors` and left as stored.
+    """
+    from accuweather_async import get_forecasts
+
+    init_db()
+    started = int(time.time())
+    targets = refresh_targets(request_ids, **filters)
+    stats = {"requests": sum(len(t[2]) for t in targets), "locations": len(targets), "fetched": 0, "failed": 0,
+             "days_added": 0, "days_changed": 0, "days_unchanged": 0, "errors": {}, "changes": {}}
+    t0 = time.perf_counter()
+    for metric in (True, False):
+        units = "metric" if metric else "imperial"
+        ids = {t[0]: t[2] for t in targets if (t[1] == "metric") == metric}
+        keys = list(ids)
+        for i in range(0, len(keys), CHUNK):
+            chunk = keys[i:i + CHUNK]
+            results = get_forecasts(chunk, metric=metric, concurrency=concurrency,
+                                    return_exceptions=True, fresh=True)
+            for key in chunk:
+                res = results[key]
+                if isinstance(res, Exception):
+                    stats["failed"] += 1
+                    stats["errors"][key] = str(res)
+                    continue
+                stats["fetched"] += 1
+                changes = merge_forecast(key, units, res, ids[key])
+                added = sum(1 for c in changes if c["kind"] == "added")
+                stats["days_added"] += added
+                stats["days_changed"] += len(changes) - added
+                stats["days_unchanged"] += len(res.get("DailyForecasts") or []) - len(changes)
+                if changes:
+                    stats["changes"][key] = changes
+            if progress:
+                progress(stats)
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    if not targets:
+        stats["run_id"] = None
+        return stats
+    stats["run_id"] = record_refresh(started, stats["requests"], stats["locations"], stats["failed"],
+                                     stats["days_added"], stats["days_changed"], stats["days_unchanged"])
+    return stats
+
+
+def main():
+    p = argparse.ArgumentParser(description="Refresh saved requests with the latest forecasts")
+    p.add_argument("--ids", help="comma-separated request ids (default: every request matching the filters)")
+    p.add_argument("--label", help="location label prefix")
+    p.add_argument("--key", help="AccuWeather location key")
+    p.add_argument("--from", dest="date_from", help="requests overlapping this date or later (YYYY-MM-DD)")
+    p.add_argument("--to", dest="date_to", help="requests overlapping this date or earlier (YYYY-MM-DD)")
+    p.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY)
+    p.add_argument("--changes", action="store_true", help="print every changed day")
+    args = p.parse_args()
+
+    def progress(s):
+        print(f"\r{s['fetched'] + s['failed']}/{s['locations']} locations", end="", file=sys.stderr)
+
+    stats = refresh([int(i) for i in args.ids.split(",")] if args.ids else None, args.concurrency, progress,
+                    label=args.label, location_key=args.key, date_from=args.date_from, date_to=args.date_to)
+    print(file=sys.stderr)
+    if not args.changes:
+        stats["changes"] = {k: len(v) for k, v in stats["changes"].items()}
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# Local stand-in for the AccuWeather (and ipinfo) endpoints the client uses.
+# Responses are replayed from recorded fixtures; latency, error rate and 429
+# behaviour are configurable, so the app, API and benchmarks can run without
+# a key, network or quota:
+#
+#   python stub_accuweather.py serve --port 8765 --latency-ms 80 --rate-limit 20 &
+#   ACCUWEATHER_BASE_URL=http://127.0.0.1:8765 ACCUWEATHER_API_KEY=stub \
+#   IPINFO_URL=http://127.0.0.1:8765/json python api.py
+#
+#   python stub_accuweather.py record --query London --query "New York"   (real key, real API)
+#
+# Fixture layout (FIXTURE_DIR): locations.json (every search endpoint filters
+# it), currentconditions/<key>.json, forecasts/<key>.json and
+# forecasts/<key>.imperial.json, ipinfo.json. Keys without a fixture are
+# served the first recorded one, so fan-out benchmarks can use any key.
+# Config can be changed at runtime with POST /_stub/config; GET /_stub/stats
+# returns per-endpoint counts.
+
+FIXTURE_DIR = os.getenv("STUB_FIXTURES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "accuweather"))
+
+DEFAULT_CONFIG = {
+    "latency_ms": float(os.getenv("STUB_LATENCY_MS", "0")),
+    "jitter_ms": float(os.getenv("STUB_JITTER_MS", "0")),
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),      # share of calls answered 503
+    "rate_limit": float(os.getenv("STUB_RATE_LIMIT", "0")),      # calls/sec before 429s (0 = unlimited)
+    "burst": float(os.getenv("STUB_BURST", "10")),
+    "throttle_rate": float(os.getenv("STUB_THROTTLE_RATE", "0")),  # share of calls answered 429 regardless
+    "retry_after": float(os.getenv("STUB_RETRY_AFTER", "1")),
+    "rebase_dates": os.getenv("STUB_REBASE_DATES", "1") != "0",  # forecast days start today, observations are this hour's
+}
+
+
+class Fixtures:
+    def __init__(self, path: str = FIXTURE_DIR):
+        self.path = path
+        self._cache: Dict[str, Any] = {}
+        self.locations = self._load("locations.json") or []
+
+    def _load(self, name: str):
+        if name not in self._cache:
+            full = os.path.join(self.path, name)
+            if os.path.exists(full):
+                with open(full, encoding="utf-8") as fh:
+                    self._cache[name] = json.load(fh)
+            else:
+                self._cache[name] = None
+        return self._cache[name]
+
+    def _default(self, folder: str, suffix: str = ""):
+        for loc in self.locations:
+            body = self._load(f"{folder}/{loc['Key']}{suffix}.json")
+            if body is not None:
+                return body
+        return None
+
+    def keyed(self, folder: str, key: str, suffix: str = ""):
+        body = self._load(f"{folder}/{key}{suffix}.json")
+        return body if body is not None else self._default(folder, suffix)
+
+    def ipinfo(self):
+        return self._load("ipinfo.json")
+
+
+def _rebase(forecast: Dict[str, Any]) -> Dict[str, Any]:
+    days = forecast.get("DailyForecasts") or []
+    if not days:
+        return forecast
+    first = date.fromisoformat(days[0]["Date"][:10])
+    shift = (date.today() - first).days
+    if not shift:
+        return forecast
+    out = dict(forecast)
+    out["DailyForecasts"] = []
+    for d in days:
+        d = dict(d)
+        d["Date"] = (date.fromisoformat(d["Date"][:10]) + timedelta(days=shift)).isoformat() + d["Date"][10:]
+        if "EpochDate" in d:
+            d["EpochDate"] += shift * 86400
+        out["DailyForecasts"].append(d)
+    return out
+
+
+def _rebase_current(current: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Observations stamped at the top of the current hour, as AccuWeather updates them
+    hour = int(time.time()) // 3600 * 3600
+    stamp = datetime.fromtimestamp(hour, timezone.utc).isoformat()
+    return [{**c, "EpochTime": hour, "LocalObservationDateTime": stamp} for c in current]
+
+
+class Stub:
+    def __init__(self, fixtures: Optional[Fixtures] = None, **config):
+        self.fixtures = fixtures or Fixtures()
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._tokens = self.config["burst"]
+        self._updated = time.monotonic()
+
+    def _count(self, endpoint: str, outcome: str):
+        s = self.stats.setdefault(endpoint, {"ok": 0, "throttled": 0, "errors": 0, "not_found": 0})
+        s[outcome] += 1
+
+    def _over_limit(self) -> bool:
+        rate = self.config["rate_limit"]
+        if rate <= 0:
+            return False
+        now = time.monotonic()
+        self._tokens = min(self.config["burst"], self._tokens + (now - self._updated) * rate)
+        self._updated = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    async def _respond(self, endpoint: str, body) -> web.Response:
+        cfg = self.config
+        delay = cfg["latency_ms"] + random.uniform(0, cfg["jitter_ms"])
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self._over_limit() or random.random() < cfg["throttle_rate"]:
+            self._count(endpoint, "throttled")
+            return web.json_response({"Code": "ServiceUnavailable", "Message": "The allowed number of requests has been exceeded."},
+                                     status=429, headers={"Retry-After": f"{cfg['retry_after']:g}"})
+        if random.random() < cfg["error_rate"]:
+            self._count(endpoint, "errors")
+            return web.json_response({"Message": "Stub injected failure"}, status=503)
+        if body is None:
+            self._count(endpoint, "not_found")
+            return web.json_response({"Message": "Location not found"}, status=400)
+        self._count(endpoint, "ok")
+        return web.json_response(body)
+
+    # --- AccuWeather endpoints ---------------------------------------------
+
+    async def text_search(self, request):
+        q = request.query.get("q", "").strip().lower()
+        hits = [l for l in self.fixtures.locations
+                if q and (l.get("LocalizedName", "").lower().startswith(q) or l.get("EnglishName", "").lower().startswith(q))]
+        return await self._respond("search", hits)
+
+    async def postal_search(self, request):
+        q = request.query.get("q", "").replace(" ", "").lower()
+        hits = [l for l in self.fixtures.locations
+                if q and (l.get("PrimaryPostalCode") or "").replace(" ", "").lower().startswith(q)]
+        return await self._respond("search", hits)
+
+    async def geo_search(self, request):
+        try:
+            lat, lon = [float(x) for x in request.query.get("q", "").split(",")]
+        except ValueError:
+            return await self._respond("search", None)
+        located = [l for l in self.fixtures.locations if l.get("GeoPosition")]
+        loc = min(located, default=None, key=lambda l: (l["GeoPosition"]["Latitude"] - lat) ** 2
+                  + (l["GeoPosition"]["Longitude"] - lon) ** 2)
+        return await self._respond("search", loc)
+
+    async def current_conditions(self, request):
+        body = self.fixtures.keyed("currentconditions", request.match_info["key"])
+        if body is not None and self.config["rebase_dates"]:
+            body = _rebase_current(body)
+        return await self._respond("current", body)
+
+    async def forecast_5day(self, request):
+        metric = request.query.get("metric", "false").lower() == "true"
+        body = self.fixtures.keyed("forecasts", request.match_info["key"], "" if metric else ".imperial")
+        if body is not None and self.config["rebase_dates"]:
+            body = _rebase(body)
+        return await self._respond("forecast", body)
+
+    async def ipinfo(self, request):
+        return await self._respond("ipinfo", self.fixtures.ipinfo())
+
+    # --- control -----------------------------------------------------------
+
+    async def get_stats(self, request):
+        return web.json_response({"config": self.config, "stats": self.stats})
+
+    async def set_config(self, request):
+        changes = await request.json()
+        unknown = set(changes) - set(self.config)
+        if unknown:
+            return web.json_response({"error": f"unknown settings: {', '.join(sorted(unknown))}"}, status=400)
+        self.config.update(changes)
+        if "reset_stats" in request.query:
+            self.stats = {}
+        return web.json_response(self.config)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get("/locations/v1/cities/search", self.text_search),
+            web.get("/locations/v1/postalcodes/search", self.postal_search),
+            web.get("/locations/v1/cities/geoposition/search", self.geo_search),
+            web.get("/currentconditions/v1/{key}", self.current_conditions),
+            web.get("/forecasts/v1/daily/5day/{key}", self.forecast_5day),
+            web.get("/json", self.ipinfo),
+            web.get("/_stub/stats", self.get_stats),
+            web.post("/_stub/config", self.set_config),
+        ])
+        return app
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 0, **config) -> Tuple[str, Stub, Any]:
+    """Run a stub on a daemon thread (port 0 picks a free one). Returns (base_url, stub, stop)."""
+    stub = Stub(**config)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    holder = {}
+
+    async def boot():
+        runner = web.AppRunner(stub.make_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        holder["runner"] = runner
+        holder["port"] = runner.addresses[0][1]
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(boot())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True, name="stub-accuweather").start()
+    ready.wait()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(holder["runner"].cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    return f"http://{host}:{holder['port']}", stub, stop
+
+
+def record(queries, out_dir: str = FIXTURE_DIR):
+    # Capture real responses through accuweather_client (uses ACCUWEATHER_API_KEY and real quota)
+    import accuweather_client as accu
+
+    os.makedirs(os.path.join(out_dir, "currentconditions"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "forecasts"), exist_ok=True)
+
+    def dump(name, body):
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as fh:
+            json.dump(body, fh, indent=2)
+            fh.write("\n")
+
+    locations = []
+    for q in queries:
+        found = accu.search_by_text(q)
+        if not found:
+            print(f"no match for {q!r}")
+            continue
+        loc = found[0]
+        key = loc["Key"]
+        locations.append(loc)
+        dump(f"currentconditions/{key}.json", accu.current_conditions(key))
+        dump(f"forecasts/{key}.json", accu.forecast_5day(key, True))
+        dump(f"forecasts/{key}.imperial.json", accu.forecast_5day(key, False))
+        print(f"recorded {key} ({loc.get('LocalizedName')})")
+    if locations:
+        dump("locations.json", locations)
+    ip = accu.http_session.get(accu.IPINFO_URL, endpoint="ipinfo")
+    if ip.status_code == 200:
+        dump("ipinfo.json", ip.json())
+
+
+def main():
+    p = argparse.ArgumentParser(description="Local AccuWeather stand-in")
+    sub = p.add_subparsers(dest="cmd")
+    s = sub.add_parser("serve", help="serve the fixtures (default)")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=8765)
+    s.add_argument("--latency-ms", type=float, default=DEFAULT_CONFIG["latency_ms"])
+    s.add_argument("--jitter-ms", type=float, default=DEFAULT_CONFIG["jitter_ms"])
+    s.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"], help="share of calls answered 503")
+    s.add_argument("--rate-limit", type=float, default=DEFAULT_CONFIG["rate_limit"], help="calls/sec before 429 (0 = off)")
+    s.add_argument("--burst", type=float, default=DEFAULT_CONFIG["burst"])
+    s.add_argument("--throttle-rate", type=float, default=DEFAULT_CONFIG["throttle_rate"], help="share of calls answered 429")
+    s.add_argument("--retry-after", type=float, default=DEFAULT_CONFIG["retry_after"])
+    s.add_argument("--fixtures", default=FIXTURE_DIR)
+    r = sub.add_parser("record", help="record fixtures from the real API")
+    r.add_argument("--query", action="append", required=True, help="city to record (repeatable)")
+    r.add_argument("--out", default=FIXTURE_DIR)
+    args = p.parse_args()
+
+    if args.cmd == "record":
+        record(args.query, args.out)
+        return
+    if args.cmd is None:
+        args = s.parse_args([])
+    stub = Stub(Fixtures(args.fixtures), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                error_rate=args.error_rate, rate_limit=args.rate_limit, burst=args.burst,
+                throttle_rate=args.throttle_rate, retry_after=args.retry_after)
+    web.run_app(stub.make_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
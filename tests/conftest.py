@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+import pytest
+import pytest_asyncio
+
+# The modules read their config from the environment at import time, so the
+# stub is started and the temp databases are pointed at before any test
+# module imports api/accuweather_client.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="weather-tests-")
+os.environ.update({
+    "WEATHER_DB": os.path.join(_tmp, "weather.db"),
+    "ACCU_CACHE_FILE": os.path.join(_tmp, "cache.db"),
+    "ACCUWEATHER_API_KEY": "stub",
+    # Budget large enough that the suite never trips the limiter unless a test sets it up
+    "ACCU_DAILY_QUOTA": "100000",
+    "ACCU_RATE_PER_SEC": "1000",
+    "ACCU_BURST": "1000",
+})
+
+import stub_accuweather  # noqa: E402
+
+STUB_URL, STUB, _stop_stub = stub_accuweather.start_in_thread()
+os.environ["ACCUWEATHER_BASE_URL"] = STUB_URL
+os.environ["IPINFO_URL"] = STUB_URL + "/json"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    _stop_stub()
+
+
+@pytest.fixture
+def stub():
+    STUB.config.update(stub_accuweather.DEFAULT_CONFIG)
+    yield STUB
+    STUB.config.update(stub_accuweather.DEFAULT_CONFIG)
+
+
+@pytest_asyncio.fixture
+async def client(aiohttp_client):
+    import api
+
+    return await aiohttp_client(api.make_app())
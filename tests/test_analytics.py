@@ -0,0 +1,52 @@
+import pandas as pd
+
+import analytics
+
+
+def _days():
+    return pd.DataFrame({
+        "location_key": ["a", "a", "a", "b", "b"],
+        "date": pd.to_datetime(["2024-05-06", "2024-05-07", "2024-05-13", "2024-05-06", "2024-05-08"]),
+        "min_temp": [10.0, 12.0, 8.0, 1.0, None],
+        "max_temp": [20.0, 22.0, 18.0, 5.0, 7.0],
+        "precip": [True, False, True, False, True],
+    })
+
+
+def _revisions():
+    return pd.DataFrame({
+        "location_key": ["a", "a", "a", "a", "b", "b"],
+        "date": ["2024-05-06", "2024-05-06", "2024-05-06", "2024-05-07", "2024-05-06", "2024-05-06"],
+        "recorded_at": [1, 2, 3, 1, 1, 2],
+        "min_temp": [10.0, 11.0, 9.0, 5.0, 1.0, 4.0],
+        "max_temp": [20.0, 20.0, 23.0, 15.0, 5.0, 5.0],
+    })
+
+
+def _chunks(df, size):
+    return (df.iloc[i:i + size] for i in range(0, len(df), size))
+
+
+def test_chunked_summaries_match_single_frame():
+    days, revisions = _days(), _revisions()
+    for size in (1, 2, 4):
+        pd.testing.assert_frame_equal(analytics.weekly_summary(_chunks(days, size)), analytics.weekly_summary(days))
+        pd.testing.assert_frame_equal(analytics.precipitation_days(_chunks(days, size)),
+                                      analytics.precipitation_days(days))
+        pd.testing.assert_frame_equal(analytics.forecast_drift(_chunks(revisions, size)),
+                                      analytics.forecast_drift(revisions))
+
+
+def test_forecast_drift_values():
+    out = analytics.forecast_drift(_revisions()).set_index("location_key")
+    assert out.loc["a", "revisions"] == 2
+    assert out.loc["a", "mean_abs_min_change"] == 1.5
+    assert out.loc["a", "max_abs_change"] == 3.0
+    assert out.loc["b", "max_abs_change"] == 3.0
+
+
+def test_weekly_summary_mean_skips_missing():
+    out = analytics.weekly_summary(_days()).set_index(["location_key", "week"])
+    assert out.loc[("a", pd.Timestamp("2024-05-06")), "mean_temp"] == 16.0
+    assert out.loc[("b", pd.Timestamp("2024-05-06")), "mean_temp"] == 3.0
+    assert out.loc[("b", pd.Timestamp("2024-05-06")), "days"] == 2
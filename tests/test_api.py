@@ -0,0 +1,146 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import threading
+
+import pytest
+
+import api
+import db_ops
+from conftest import ROOT
+from db import init_db
+
+pytestmark = pytest.mark.asyncio
+
+EXPORT_LABEL = "export-load"
+EXPORT_REQUESTS = 3000
+# A stuck export hangs the request rather than failing it
+EXPORT_TIMEOUT = 60
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    # Enough rows that the export overruns the handler's queue (8 x 64 KiB) several times
+    init_db()
+    with open(os.path.join(ROOT, "fixtures", "accuweather", "forecasts", "328328.json"), encoding="utf-8") as fh:
+        data = json.load(fh)
+    days = [d["Date"][:10] for d in data["DailyForecasts"]]
+    rows = [("328328", f"{EXPORT_LABEL} {i}", days[0], days[-1], "metric", data) for i in range(EXPORT_REQUESTS)]
+    db_ops.save_requests_bulk(rows)
+    return EXPORT_REQUESTS * len(days)
+
+
+async def test_health(client):
+    resp = await client.get("/healthz")
+    assert resp.status == 200
+    assert await resp.json() == {"ok": True}
+
+
+async def test_search(client, stub):
+    resp = await client.get("/search", params={"q": "London"})
+    assert resp.status == 200
+    assert any(r["Key"] == "328328" for r in await resp.json())
+
+
+async def test_forecast_etag(client, stub):
+    resp = await client.get("/locations/349727/forecast")
+    assert resp.status == 200
+    assert (await resp.json())["DailyForecasts"]
+    tag = resp.headers["ETag"]
+    resp = await client.get("/locations/349727/forecast", headers={"If-None-Match": tag})
+    assert resp.status == 304
+
+
+async def test_upstream_error_is_mapped(client, stub):
+    stub.config["error_rate"] = 1.0
+    resp = await client.get("/locations/999001/current")
+    assert resp.status >= 500
+    assert "error" in await resp.json()
+
+
+async def test_create_and_fetch_saved(client, stub):
+    resp = await client.post("/requests", json={
+        "location_key": "226396", "location_label": "Tokyo", "start_date": "2024-01-01", "end_date": "2030-12-31",
+    })
+    assert resp.status == 201
+    created = await resp.json()
+    resp = await client.get(f"/requests/{created['id']}")
+    assert resp.status == 200
+    assert (await resp.json())["location_label"] == "Tokyo"
+    resp = await client.post("/requests", json={"location_key": "226396"})
+    assert resp.status == 400
+
+
+async def test_export_rejects_unknown_format(client):
+    resp = await client.get("/requests/export", params={"format": "xlsx"})
+    assert resp.status == 400
+
+
+async def _read_body(resp, chunk_size: int, delay: float = 0):
+    body = bytearray()
+    chunks = 0
+    async for chunk in resp.content.iter_chunked(chunk_size):
+        body += chunk
+        chunks += 1
+        if delay:
+            await asyncio.sleep(delay)
+    return body, chunks
+
+
+async def test_export_large_streamed(client, seeded):
+    resp = await client.get("/requests/export", params={"format": "csv", "label": EXPORT_LABEL})
+    assert resp.status == 200
+    assert "Content-Length" not in resp.headers
+    body, chunks = await asyncio.wait_for(_read_body(resp, 64 * 1024), EXPORT_TIMEOUT)
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert len(rows) - 1 == seeded
+    assert len(body) > 8 * 64 * 1024
+    assert chunks > 8
+
+
+async def test_export_slow_client(client, seeded):
+    # The writer thread stalls on the full queue until the client catches up
+    resp = await client.get("/requests/export", params={"format": "jsonl", "label": EXPORT_LABEL})
+    assert resp.status == 200
+    body, _ = await asyncio.wait_for(_read_body(resp, 256 * 1024, delay=0.05), EXPORT_TIMEOUT)
+    assert body.count(b"\n") == seeded
+
+
+async def test_export_client_disconnect_stops_worker(client, seeded, monkeypatch):
+    finished = threading.Event()
+    real_export = api.export
+
+    def tracked(*args, **kwargs):
+        try:
+            return real_export(*args, **kwargs)
+        finally:
+            finished.set()
+
+    monkeypatch.setattr(api, "export", tracked)
+    resp = await client.get("/requests/export", params={"format": "csv", "label": EXPORT_LABEL})
+    assert resp.status == 200
+    await resp.content.read(64 * 1024)
+    resp.close()
+    assert await asyncio.to_thread(finished.wait, EXPORT_TIMEOUT), "export worker still blocked after disconnect"
+    resp = await client.get("/healthz")
+    assert resp.status == 200
+
+
+@pytest.mark.parametrize("body", ["{bad", "[1,2]", '{"request_ids":["x"]}', '{"request_ids":"12"}', '{"date_from":5}'])
+async def test_refresh_rejects_bad_bodies(client, body):
+    resp = await client.post("/requests/refresh", data=body, headers={"Content-Type": "application/json"})
+    assert resp.status == 400
+    assert "error" in await resp.json()
+
+
+async def test_delete_missing_request_is_404(client):
+    resp = await client.delete("/requests/999999")
+    assert resp.status == 404
+    resp = await client.post("/requests", json={
+        "location_key": "226396", "start_date": "2024-01-01", "end_date": "2024-01-02",
+    })
+    rid = (await resp.json())["id"]
+    assert (await client.delete(f"/requests/{rid}")).status == 204
+    assert (await client.delete(f"/requests/{rid}")).status == 404
@@ -0,0 +1,70 @@
+import accuweather_client
+import ratelimit
+from http_session import MAX_RETRIES
+
+
+def _used():
+    return ratelimit.get_ledger().used(ratelimit._key_hash(accuweather_client.API_KEY))
+
+
+def test_every_retry_spends_quota(stub):
+    stub.config.update(throttle_rate=1.0, retry_after=0)
+    before = _used()
+    try:
+        accuweather_client.current_conditions("999101")
+    except accuweather_client.AccuError:
+        pass
+    assert _used() - before == MAX_RETRIES + 1
+    assert stub.stats["current"]["throttled"] >= MAX_RETRIES + 1
+
+
+def test_retries_stop_when_the_limiter_refuses(stub, monkeypatch):
+    stub.config.update(throttle_rate=1.0, retry_after=0)
+    calls = []
+
+    def acquire(api_key):
+        calls.append(api_key)
+        if len(calls) > 1:
+            raise ratelimit.RateLimited("test budget")
+
+    monkeypatch.setattr(ratelimit, "acquire", acquire)
+    before = stub.stats.get("current", {}).get("throttled", 0)
+    try:
+        accuweather_client.current_conditions("999102")
+    except accuweather_client.QuotaError as e:
+        assert "test budget" in str(e)
+    else:
+        raise AssertionError("expected QuotaError")
+    assert stub.stats["current"]["throttled"] - before == 1
+
+
+def test_interactive_miss_does_not_join_background_flight(stub, monkeypatch):
+    import threading
+    import time
+
+    real_acquire = ratelimit.acquire
+    started = threading.Event()
+
+    def acquire(api_key):
+        if ratelimit.current_priority() == ratelimit.BACKGROUND:
+            started.set()
+            time.sleep(0.5)
+            raise ratelimit.RateLimited("background reserve")
+        real_acquire(api_key)
+
+    monkeypatch.setattr(ratelimit, "acquire", acquire)
+    warmer = threading.Thread(target=lambda: _warm("999103"))
+    warmer.start()
+    assert started.wait(5)
+    t0 = time.monotonic()
+    assert accuweather_client.current_conditions("999103")
+    assert time.monotonic() - t0 < 0.4
+    warmer.join()
+
+
+def _warm(key):
+    with ratelimit.priority(ratelimit.BACKGROUND):
+        try:
+            accuweather_client.warm_location(key, {})
+        except accuweather_client.QuotaError:
+            pass
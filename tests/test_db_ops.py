@@ -0,0 +1,122 @@
+import copy
+import json
+import os
+
+import pytest
+
+import db_ops
+from conftest import ROOT
+from db import init_db, get_conn
+
+KEY = "990001"
+
+
+@pytest.fixture(scope="module")
+def forecast():
+    init_db()
+    with open(os.path.join(ROOT, "fixtures", "accuweather", "forecasts", "328328.json"), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _warmer(data, by):
+    data = copy.deepcopy(data)
+    for d in data["DailyForecasts"]:
+        d["Temperature"]["Maximum"]["Value"] += by
+    return data
+
+
+def _max_temps(rid):
+    return [d["Temperature"]["Maximum"]["Value"] for d in db_ops.get_request_days(rid)]
+
+
+def _window(data):
+    return data["DailyForecasts"][0]["Date"][:10], data["DailyForecasts"][-1]["Date"][:10]
+
+
+def test_later_save_keeps_older_snapshot(forecast):
+    start, end = _window(forecast)
+    first = db_ops.save_request(KEY, "snapshot a", start, end, "metric", forecast)
+    original = _max_temps(first)
+    second = db_ops.save_request(KEY, "snapshot b", start, end, "metric", _warmer(forecast, 5))
+    assert _max_temps(first) == original
+    assert _max_temps(second) == [t + 5 for t in original]
+    exported = {r[2]: r[4] for r in db_ops.iter_export_rows(request_ids=[first])}
+    assert list(exported.values()) == original
+
+
+def test_bulk_save_links_each_request(forecast):
+    start, end = _window(forecast)
+    db_ops.save_requests_bulk([(KEY, f"bulk snapshot {i}", start, end, "metric", _warmer(forecast, i))
+                               for i in range(3)])
+    rows, _ = db_ops.list_requests_page(3, label="bulk snapshot")
+    base = [d["Temperature"]["Maximum"]["Value"] for d in forecast["DailyForecasts"]]
+    for rid, label, *_ in rows:
+        i = int(label.rsplit(" ", 1)[1])
+        assert _max_temps(rid) == [t + i for t in base]
+
+
+def test_refresh_moves_only_selected_requests(forecast):
+    start, end = _window(forecast)
+    kept = db_ops.save_request(KEY, "refresh kept", start, end, "metric", forecast)
+    moved = db_ops.save_request(KEY, "refresh moved", start, end, "metric", forecast)
+    original = _max_temps(kept)
+    db_ops.merge_forecast(KEY, "metric", _warmer(forecast, 9), [moved])
+    assert _max_temps(kept) == original
+    assert _max_temps(moved) == [t + 9 for t in original]
+
+
+def test_gc_keeps_snapshot_payloads_and_delete_drops_them(forecast):
+    start, end = _window(forecast)
+    rid = db_ops.save_request(KEY, "gc snapshot", start, end, "metric", _warmer(forecast, 40))
+    db_ops.save_request(KEY, "gc newer", start, end, "metric", _warmer(forecast, 41))
+    db_ops.gc_payloads()
+    assert _max_temps(rid)
+    db_ops.delete_request(rid)
+    assert get_conn().execute("SELECT COUNT(*) FROM request_days WHERE request_id = ?", (rid,)).fetchone()[0] == 0
+
+
+def test_gc_prunes_old_revisions_but_keeps_recent_payloads(forecast):
+    start, end = _window(forecast)
+    db_ops.save_request("990002", "revision gc", start, end, "metric", _warmer(forecast, 60))
+    db_ops.save_request("990002", "revision gc 2", start, end, "metric", _warmer(forecast, 61))
+    conn = get_conn()
+    hashes = [h for (h,) in conn.execute(
+        "SELECT payload_hash FROM forecast_revisions WHERE location_key = '990002' ORDER BY recorded_at")]
+    db_ops.gc_payloads()
+    missing = conn.execute(f"""SELECT COUNT(*) FROM forecast_revisions r
+        WHERE r.location_key = '990002' AND r.payload_hash NOT IN (SELECT hash FROM forecast_payloads)""").fetchone()[0]
+    assert hashes and missing == 0
+    conn.execute("UPDATE forecast_revisions SET recorded_at = recorded_at - 100 * 86400 WHERE location_key = '990002'")
+    db_ops.gc_payloads(revision_days=90)
+    assert conn.execute("SELECT COUNT(*) FROM forecast_revisions WHERE location_key = '990002'").fetchone()[0] == 0
+
+
+def test_date_range_export_is_clipped(forecast):
+    start, end = _window(forecast)
+    rid = db_ops.save_request("990003", "clipped export", start, end, "metric", forecast)
+    dates = [d["Date"][:10] for d in forecast["DailyForecasts"]]
+    rows = list(db_ops.iter_export_rows(request_ids=[rid], date_from=dates[1], date_to=dates[2]))
+    assert [r[2] for r in rows] == dates[1:3]
+    assert len(list(db_ops.iter_export_rows(request_ids=[rid]))) == len(dates)
+
+
+def test_pruned_revisions_stay_pruned_and_v2_upgrade_seeds_once(forecast, tmp_path, monkeypatch):
+    import db
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "upgrade.db"))
+    init_db(force=True)
+    start, end = _window(forecast)
+    rid = db_ops.save_request(KEY, "upgrade", start, end, "metric", forecast)
+    conn = get_conn()
+    # Look like a v2 database: no snapshot, no history
+    conn.execute("DELETE FROM request_days")
+    conn.execute("DELETE FROM forecast_revisions")
+    conn.execute("PRAGMA user_version = 2")
+    init_db(force=True)
+    days = len(forecast["DailyForecasts"])
+    assert conn.execute("SELECT COUNT(*) FROM request_days WHERE request_id = ?", (rid,)).fetchone()[0] == days
+    assert conn.execute("SELECT COUNT(*) FROM forecast_revisions").fetchone()[0] == days
+    conn.execute("UPDATE forecast_revisions SET recorded_at = recorded_at - 100 * 86400")
+    db_ops.gc_payloads(revision_days=90)
+    init_db(force=True)
+    assert conn.execute("SELECT COUNT(*) FROM forecast_revisions").fetchone()[0] == 0
+    db.close_conn()
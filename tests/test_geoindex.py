@@ -0,0 +1,36 @@
+import geoindex
+
+
+def _upstream():
+    return geoindex.stats()["upstream"]
+
+
+def test_prefix_of_indexed_name_goes_upstream(stub):
+    assert [r["Key"] for r in geoindex.resolve("New York")] == ["349727"]
+    before = _upstream()
+    # "New" is a prefix of an indexed name, but that is no proof it is the whole answer
+    assert [r["Key"] for r in geoindex.resolve("New")] == ["349727"]
+    assert _upstream() == before + 1
+
+
+def test_indexed_exact_name_still_goes_upstream(stub):
+    # Indexed from a coordinates lookup only: upstream may know other places of that name
+    tokyo = geoindex.resolve("35.68,139.69")[0]
+    assert tokyo["Key"] == "226396"
+    before = _upstream()
+    assert [r["Key"] for r in geoindex.resolve("Tokyo")] == ["226396"]
+    assert _upstream() == before + 1
+
+
+def test_repeated_query_uses_recorded_result_set(stub):
+    results = geoindex.resolve("Lond")
+    before = _upstream()
+    assert geoindex.resolve("  lond ") == results
+    assert _upstream() == before
+
+
+def test_empty_upstream_result_is_remembered(stub):
+    assert geoindex.resolve("Atlantis") == []
+    before = _upstream()
+    assert geoindex.resolve("atlantis") == []
+    assert _upstream() == before
@@ -0,0 +1,24 @@
+import accuweather_client
+import db_ops
+import refresh
+from db import init_db
+
+KEY = "351409"  # no fixture of its own: served the default forecast
+
+
+def _forecast_calls(stub):
+    return stub.stats.get("forecast", {}).get("ok", 0)
+
+
+def test_refresh_bypasses_fresh_cache_entry(stub):
+    init_db()
+    data = accuweather_client.forecast_5day(KEY)
+    days = [d["Date"][:10] for d in data["DailyForecasts"]]
+    rid = db_ops.save_request(KEY, "refresh test", days[0], days[-1], "metric", data)
+    before = _forecast_calls(stub)
+    accuweather_client.forecast_5day(KEY)
+    assert _forecast_calls(stub) == before  # served from the response cache
+
+    result = refresh.refresh([rid])
+    assert result["fetched"] == 1
+    assert _forecast_calls(stub) == before + 1